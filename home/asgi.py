@@ -0,0 +1,138 @@
+"""ASGI application serving cached pages without entering Django."""
+
+from django.conf import settings
+from django.http.cookie import parse_cookie
+from django.utils.http import parse_etags, parse_http_date_safe
+
+from .cache import SCOPE_KEY, acache_url_response, aget_url_response, get_deploy_version
+
+# Headers describing a single render rather than the page
+RENDER_HEADERS = {b"content-length", b"server-timing", b"x-query-stats"}
+
+# Headers a 304 response repeats, as get_conditional_response() does
+NOT_MODIFIED_HEADERS = {
+    b"cache-control",
+    b"content-location",
+    b"date",
+    b"etag",
+    b"expires",
+    b"last-modified",
+    b"vary",
+}
+
+
+def get_header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class CachedPageApplication:
+    """
+    Answer anonymous GET and HEAD requests for cached pages from the page
+    cache, on the event loop, without a thread, middleware or queries.
+
+    Every other request is passed to ``application``. When it serves a page
+    from or into the page cache, the final response headers are stored for the
+    URL, so the next request for it takes the fast path.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        # Part of the cache keys, read the project files now rather than on
+        # the event loop
+        get_deploy_version()
+
+    async def __call__(self, scope, receive, send):
+        if not self.is_cacheable(scope):
+            return await self.application(scope, receive, send)
+
+        host = get_header(scope, b"host") or ""
+        path = scope["path"]
+        cached = await aget_url_response(host, path)
+        if cached is not None:
+            return await self.send_cached(scope, send, *cached)
+
+        await self.application(scope, receive, self.recorder(scope, send, host, path))
+
+    def is_cacheable(self, scope):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return False
+
+        # Each query string would be an entry of its own, crawlers could add
+        # them without end. Django still serves these from the page cache.
+        if scope["query_string"]:
+            return False
+
+        # Logged in editors see the user bar, leave them to Django
+        cookies = parse_cookie(get_header(scope, b"cookie") or "")
+        return settings.SESSION_COOKIE_NAME not in cookies
+
+    def recorder(self, scope, send, host, path):
+        async def record(message):
+            if message["type"] == "http.response.start":
+                await self.remember(scope, message, host, path)
+            await send(message)
+
+        return record
+
+    async def remember(self, scope, message, host, path):
+        cached = scope.get(SCOPE_KEY)
+        if cached is None or message["status"] != 200:
+            return
+
+        headers = [(bytes(k).lower(), bytes(v)) for k, v in message["headers"]]
+        if any(key == b"set-cookie" for key, value in headers):
+            return
+
+        page_id, version, key = cached
+        headers = [(k, v) for k, v in headers if k not in RENDER_HEADERS]
+        await acache_url_response(host, path, page_id, version, key, headers)
+
+    async def send_cached(self, scope, send, headers, content):
+        if self.is_not_modified(scope, headers):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [(k, v) for k, v in headers if k in NOT_MODIFIED_HEADERS],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": headers + [(b"content-length", str(len(content)).encode())],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b"" if scope["method"] == "HEAD" else content,
+            }
+        )
+
+    def is_not_modified(self, scope, headers):
+        """The conditional GET check of ``get_conditional_response()``."""
+        values = dict(headers)
+        if_none_match = get_header(scope, b"if-none-match")
+        if if_none_match is not None:
+            etag = values.get(b"etag", b"").decode("latin-1")
+            etags = parse_etags(if_none_match)
+            # Weak comparison, as in RFC 9110 section 13.1.2
+            return bool(etag) and (
+                "*" in etags
+                or etag.removeprefix("W/") in [e.removeprefix("W/") for e in etags]
+            )
+
+        if_modified_since = parse_http_date_safe(get_header(scope, b"if-modified-since") or "")
+        last_modified = parse_http_date_safe(values.get(b"last-modified", b"").decode("latin-1"))
+        return (
+            if_modified_since is not None
+            and last_modified is not None
+            and last_modified <= if_modified_since
+        )
@@ -1,10 +1,184 @@
 """Shared blocks for the Resolve.works site."""
 
+import hashlib
+import json
+from contextvars import ContextVar
+
+from django.db import models
+from django.utils.safestring import mark_safe
 from wagtail import blocks
 from wagtail.images.blocks import ImageChooserBlock
 
+from .cache import get_deploy_version, get_fragment, get_reference_versions, set_fragment
+from .rich_text import MemoizedRichTextBlock, block_references
+from .timing import block_timings
+
+# Images loaded up front for the StreamField currently being rendered, by id
+prefetched_images = ContextVar("prefetched_images", default=None)
+
+
+def block_fingerprint(block, value):
+    """
+    Reduce a block value to plain data that only depends on its content.
+
+    Stream and list item ids are left out so identical content hashes the same
+    across revisions and pages.
+    """
+    if isinstance(block, blocks.StructBlock):
+        return {
+            name: block_fingerprint(child_block, value.get(name))
+            for name, child_block in block.child_blocks.items()
+        }
+
+    if isinstance(block, blocks.ListBlock):
+        return [block_fingerprint(block.child_block, item) for item in value]
+
+    if isinstance(block, blocks.StreamBlock):
+        return [
+            [child.block_type, block_fingerprint(child.block, child.value)]
+            for child in value
+        ]
+
+    if isinstance(value, models.Model):
+        # Include the file so a replaced image renders a fresh fragment.
+        return [value._meta.label, value.pk, str(getattr(value, "file", ""))]
+
+    return block.get_prep_value(value)
+
+
+def walk_raw_blocks(block, raw_value):
+    """Like ``walk_blocks``, but over the stored JSON so no values get converted."""
+    yield block, raw_value
+
+    if raw_value is None:
+        return
+
+    if isinstance(block, blocks.StructBlock):
+        for name, child_block in block.child_blocks.items():
+            yield from walk_raw_blocks(child_block, raw_value.get(name))
+
+    elif isinstance(block, blocks.ListBlock):
+        for item in raw_value:
+            if isinstance(item, dict) and item.get("type") == "item" and "value" in item:
+                item = item["value"]
+            yield from walk_raw_blocks(block.child_block, item)
+
+    elif isinstance(block, blocks.StreamBlock):
+        for item in raw_value:
+            child_block = block.child_blocks.get(item["type"])
+            if child_block is not None:
+                yield from walk_raw_blocks(child_block, item["value"])
+
+
+def walk_blocks(block, value):
+    """Yield ``(block, value)`` for ``value`` and every value nested inside it."""
+    yield block, value
+
+    if value is None:
+        return
+
+    if isinstance(block, blocks.StructBlock):
+        for name, child_block in block.child_blocks.items():
+            yield from walk_blocks(child_block, value.get(name))
 
-class HeroBlock(blocks.StructBlock):
+    elif isinstance(block, blocks.ListBlock):
+        for item in value:
+            yield from walk_blocks(block.child_block, item)
+
+    elif isinstance(block, blocks.StreamBlock):
+        for child in value:
+            yield from walk_blocks(child.block, child.value)
+
+
+def live_stream_values():
+    """Yield the value of every StreamField on every live page."""
+    from wagtail.fields import StreamField
+    from wagtail.models import get_page_models
+
+    for model in get_page_models():
+        stream_fields = [
+            field.name
+            for field in model._meta.get_fields()
+            if isinstance(field, StreamField) and field.model is model
+        ]
+        if not stream_fields:
+            continue
+
+        for page in model.objects.live().only(*stream_fields):
+            for name in stream_fields:
+                yield getattr(page, name)
+
+
+class PrefetchedImageChooserBlock(ImageChooserBlock):
+    """Image chooser that takes images from an active prefetch before querying."""
+
+    def to_python(self, value):
+        images = prefetched_images.get()
+        if images is not None and value in images:
+            return images[value]
+        return super().to_python(value)
+
+    def bulk_to_python(self, values):
+        images = prefetched_images.get()
+        if images is None or any(v is not None and v not in images for v in values):
+            return super().bulk_to_python(values)
+        return [images.get(v) for v in values]
+
+
+class CachedBlockMixin:
+    """
+    Opt-in fragment cache for blocks whose template only depends on their value.
+
+    Rendered HTML is keyed on the block type and a hash of the value, so it is
+    shared between revisions and pages, of the versions of the pages and
+    documents it links to, whose URLs are in the HTML too, and of the deployed
+    templates.
+    """
+
+    def get_fragment_digest(self, value):
+        data = json.dumps(
+            [
+                block_fingerprint(self, value),
+                get_reference_versions(block_references(self, value)),
+                get_deploy_version()[0],
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def render(self, value, context=None):
+        block_type = type(self).__name__
+        digest = self.get_fragment_digest(value)
+
+        html = get_fragment(block_type, digest)
+        if html is None:
+            html = super().render(value, context=context)
+            set_fragment(block_type, digest, html)
+
+        return mark_safe(html)
+
+
+class TimedBlockMixin:
+    """
+    Record how long each render takes when block timings are being recorded
+    for the current page, see ``home.timing``. Put it before
+    ``CachedBlockMixin`` so cache hits are timed as well.
+    """
+
+    def render(self, value, context=None):
+        timings = block_timings.get()
+        if timings is None:
+            return super().render(value, context=context)
+
+        started = timings.start()
+        try:
+            return super().render(value, context=context)
+        finally:
+            timings.stop(type(self).__name__, started)
+
+
+class HeroBlock(TimedBlockMixin, blocks.StructBlock):
     """Hero block for homepage header."""
 
     heading = blocks.CharBlock(
@@ -31,13 +205,13 @@ class FeatureItemBlock(blocks.StructBlock):
     """Individual feature item."""
 
     heading = blocks.CharBlock(required=True, max_length=100)
-    description = blocks.RichTextBlock(features=["bold", "italic", "link"])
+    description = MemoizedRichTextBlock(features=["bold", "italic", "link"])
 
     class Meta:
         icon = "list-ul"
 
 
-class FeaturesBlock(blocks.StructBlock):
+class FeaturesBlock(TimedBlockMixin, CachedBlockMixin, blocks.StructBlock):
     """Configurable features list with 3 or 4 columns."""
 
     columns = blocks.ChoiceBlock(
@@ -60,7 +234,7 @@ class DefinitionListItemBlock(blocks.StructBlock):
     """Individual term-definition pair for a definition list."""
 
     term = blocks.CharBlock(required=True, max_length=100, help_text="Definition term (dt)")
-    definition = blocks.RichTextBlock(
+    definition = MemoizedRichTextBlock(
         required=True,
         features=["bold", "italic", "link"],
         help_text="Definition description (dd)"
@@ -70,7 +244,7 @@ class DefinitionListItemBlock(blocks.StructBlock):
         icon = "list-ul"
 
 
-class DefinitionListBlock(blocks.StructBlock):
+class DefinitionListBlock(TimedBlockMixin, CachedBlockMixin, blocks.StructBlock):
     """Definition list (dl) with term-definition pairs."""
 
     items = blocks.ListBlock(DefinitionListItemBlock())
@@ -81,7 +255,7 @@ class DefinitionListBlock(blocks.StructBlock):
         template = "blocks/definition_list_block.html"
 
 
-class TwoColumnBlock(blocks.StructBlock):
+class TwoColumnBlock(TimedBlockMixin, CachedBlockMixin, blocks.StructBlock):
     """Two-column layout with image on one side and content on the other."""
 
     image_position = blocks.ChoiceBlock(
@@ -93,19 +267,19 @@ class TwoColumnBlock(blocks.StructBlock):
         help_text="Which side to place the image",
     )
 
-    image = ImageChooserBlock(required=True, help_text="Image for the column")
+    image = PrefetchedImageChooserBlock(required=True, help_text="Image for the column")
 
     content = blocks.StreamBlock(
         [
             (
                 "heading",
-                blocks.RichTextBlock(
+                MemoizedRichTextBlock(
                     features=["h4"], help_text="Heading (h4)"
                 ),
             ),
             (
                 "paragraph",
-                blocks.RichTextBlock(
+                MemoizedRichTextBlock(
                     features=["bold", "italic", "link"], help_text="Paragraph of text"
                 ),
             ),
@@ -119,9 +293,58 @@ class TwoColumnBlock(blocks.StructBlock):
         icon = "image"
         label = "Two Column (Image + Content)"
         template = "blocks/two_column_block.html"
-
-
-class SectionBlock(blocks.StructBlock):
+        # The image is rendered as a <picture> with one srcset per format; the
+        # last format is the <img> fallback for browsers without AVIF/WebP.
+        image_widths = [320, 480, 640, 800]
+        image_formats = ["avif", "webp", "jpeg"]
+        image_sizes = "(min-width: 768px) min(50vw, 35rem), 100vw"
+
+    def get_rendition_filters(self):
+        return [
+            f"width-{width}|format-{image_format}"
+            for image_format in self.meta.image_formats
+            for width in self.meta.image_widths
+        ]
+
+    def get_rendition_requests(self, value):
+        """Images in ``value`` and the filter specs the template renders them with."""
+        if value.get("image") is None:
+            return []
+        return [(value["image"], self.get_rendition_filters())]
+
+    def get_context(self, value, parent_context=None):
+        context = super().get_context(value, parent_context=parent_context)
+
+        image = value.get("image")
+        if image is None:
+            return context
+
+        renditions = image.get_renditions(*self.get_rendition_filters())
+        sources = []
+        for image_format in self.meta.image_formats:
+            # Widths larger than the original are not upscaled, skip duplicates
+            by_width = {}
+            for width in self.meta.image_widths:
+                rendition = renditions[f"width-{width}|format-{image_format}"]
+                by_width.setdefault(rendition.width, rendition)
+
+            sources.append(
+                {
+                    "type": f"image/{image_format}",
+                    "srcset": ", ".join(
+                        f"{rendition.url} {width}w" for width, rendition in by_width.items()
+                    ),
+                    "largest": list(by_width.values())[-1],
+                }
+            )
+
+        context["sources"] = sources[:-1]
+        context["fallback"] = sources[-1]
+        context["sizes"] = self.meta.image_sizes
+        return context
+
+
+class SectionBlock(TimedBlockMixin, CachedBlockMixin, blocks.StructBlock):
     """Generic section block with title, background, and flexible content."""
 
     title = blocks.CharBlock(
@@ -141,13 +364,13 @@ class SectionBlock(blocks.StructBlock):
         [
             (
                 "heading",
-                blocks.RichTextBlock(
+                MemoizedRichTextBlock(
                     features=["h4"], help_text="Heading (h4)"
                 ),
             ),
             (
                 "paragraph",
-                blocks.RichTextBlock(
+                MemoizedRichTextBlock(
                     features=["bold", "italic", "link"], help_text="Paragraph of text"
                 ),
             ),
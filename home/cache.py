@@ -0,0 +1,352 @@
+"""Rendered page and block fragment caches for anonymous visitors."""
+
+import functools
+import hashlib
+import os
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+
+KEY_PREFIX = "home:page"
+
+# Set in the ASGI scope to the page id and cache key of the response served
+SCOPE_KEY = "home.page_cache_key"
+
+
+def get_page_cache():
+    """Return the cache backend used for rendered page responses."""
+    return caches[getattr(settings, "PAGE_CACHE_ALIAS", "default")]
+
+
+def _shared(cache):
+    # Keys updated in place skip the in-process copy of resolve.cache.TieredCache,
+    # another process may have changed them since
+    return getattr(cache, "shared", cache)
+
+
+def is_cacheable_request(request):
+    """
+    Non-preview GET/HEAD requests share a cached response. Pages render the
+    same for every user, the user bar is fetched separately.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return False
+
+    return not getattr(request, "is_preview", False)
+
+
+def _version_key(page_id):
+    return f"{KEY_PREFIX}:{page_id}:version"
+
+
+def get_page_version(page_id):
+    """
+    Random token in the cache keys of every response of a page, whichever
+    host or revision it was rendered for. ``invalidate_page()`` deletes it,
+    so all of them are dropped at once without tracking their keys.
+    """
+    cache = get_page_cache()
+    key = _version_key(page_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def get_cache_key(page, request, version=None):
+    """
+    Cache key for a page response: page id and version, live revision, the
+    deployed templates and static files, and host.
+    """
+    if version is None:
+        version = get_page_version(page.pk)
+    deployed = get_deploy_version()[0]
+    return (
+        f"{KEY_PREFIX}:{page.pk}:{version}:{page.live_revision_id}:{deployed}:"
+        f"{request.get_host()}"
+    )
+
+
+def get_cached_response(page, request):
+    """Return a fresh ``HttpResponse`` from the cache, or ``None`` on a miss."""
+    cached = get_page_cache().get(get_cache_key(page, request))
+    if cached is None:
+        return None
+
+    status, content_type, content = cached
+    return HttpResponse(content, content_type=content_type, status=status)
+
+
+def cache_response(page, request, response):
+    """Render ``response`` if needed and store it for later anonymous requests."""
+    if response.status_code != 200 or response.streaming:
+        return response
+
+    if hasattr(response, "render"):
+        response.render()
+
+    cache_content(page, request, response["Content-Type"], response.content)
+    return response
+
+
+def cache_content(page, request, content_type, content):
+    """Store a rendered 200 response body for later anonymous requests."""
+    cache = get_page_cache()
+    timeout = getattr(settings, "PAGE_CACHE_TIMEOUT", None)
+    key = get_cache_key(page, request)
+
+    cache.set(key, (200, content_type, content), timeout)
+
+
+def remember_cache_key(page, request):
+    """
+    Tell the ASGI application which cached content answers this request, so it
+    can serve the URL without Django next time.
+    """
+    scope = getattr(request, "scope", None)
+    if scope is not None:
+        version = get_page_version(page.pk)
+        scope[SCOPE_KEY] = (page.pk, version, get_cache_key(page, request, version))
+
+
+def invalidate_page(page_id):
+    """
+    Drop every cached response for the given page, by changing its version.
+    The responses themselves are left to expire.
+    """
+    get_page_cache().delete(_version_key(page_id))
+
+
+URL_KEY_PREFIX = "home:url"
+
+
+def get_url_cache_key(host, path):
+    """
+    Cache key for the response headers of a URL without a query string, for
+    the deployed templates and static files.
+    """
+    digest = hashlib.sha256(f"{host}{path}".encode()).hexdigest()
+    return f"{URL_KEY_PREFIX}:{get_deploy_version()[0]}:{digest}"
+
+
+async def _aget(cache, key, default=None):
+    # The in-process cache does not block, its async methods would only add a
+    # trip through a thread. TieredCache only uses one for its shared cache.
+    if isinstance(cache, LocMemCache):
+        return cache.get(key, default)
+    return await cache.aget(key, default)
+
+
+async def _aset(cache, key, value, timeout):
+    if isinstance(cache, LocMemCache):
+        cache.set(key, value, timeout)
+    else:
+        await cache.aset(key, value, timeout)
+
+
+async def aget_url_response(host, path):
+    """Cached ``(headers, content)`` for a URL, or ``None`` on a miss."""
+    cache = get_page_cache()
+    entry = await _aget(cache, get_url_cache_key(host, path))
+    if entry is None:
+        return None
+
+    page_id, version, key, headers = entry
+    # Stored for an earlier version of the page, invalidate_page() was called
+    if await _aget(cache, _version_key(page_id)) != version:
+        return None
+
+    cached = await _aget(cache, key)
+    if cached is None:
+        return None
+
+    return headers, cached[2]
+
+
+async def acache_url_response(host, path, page_id, version, key, headers):
+    """
+    Store the final response headers of a URL next to the cached content under
+    ``key``, with the version of the page it was rendered for.
+    """
+    cache = get_page_cache()
+    timeout = getattr(settings, "PAGE_CACHE_TIMEOUT", None)
+    await _aset(
+        cache, get_url_cache_key(host, path), (page_id, version, key, headers), timeout
+    )
+
+
+def purge_url(host, path):
+    """Drop the stored response headers of a URL, see ``home.frontend_cache``."""
+    get_page_cache().delete(get_url_cache_key(host, path))
+
+
+@functools.cache
+def get_deploy_version():
+    """
+    Fingerprint and newest modification time of the project templates and
+    static files. These only change on deploy, so this runs once per process.
+    """
+    from .export import directories_fingerprint, template_dirs
+
+    static_dirs = [
+        directory[1] if isinstance(directory, (list, tuple)) else directory
+        for directory in settings.STATICFILES_DIRS
+    ]
+    return directories_fingerprint(
+        template_dirs() + [d for d in static_dirs if os.path.isdir(d)]
+    )
+
+
+def _links_key(page_id):
+    return f"{KEY_PREFIX}:{page_id}:links"
+
+
+def get_links_changed_at(page_id):
+    """
+    Timestamp of the last change to the pages and documents a page links to.
+    When it is not known, e.g. after the cache was cleared, it counts as now.
+    """
+    cache = _shared(get_page_cache())
+    key = _links_key(page_id)
+    changed_at = cache.get(key)
+    if changed_at is None:
+        cache.add(key, time.time(), None)
+        changed_at = cache.get(key)
+    return changed_at
+
+
+def links_changed(page_id):
+    _shared(get_page_cache()).set(_links_key(page_id), time.time(), None)
+
+
+def get_page_validators(page):
+    """
+    Strong ETag and Last-Modified timestamp for the live version of a page.
+
+    Both change when the page is published, a page or document it links to
+    changes, or a template or static file is deployed, as each changes the
+    rendered HTML.
+    """
+    fingerprint, deployed_at = get_deploy_version()
+    links_changed_at = get_links_changed_at(page.pk)
+    version = f"{page.pk}:{page.live_revision_id}:{links_changed_at!r}:{fingerprint}"
+    etag = '"%s"' % hashlib.sha256(version.encode()).hexdigest()[:32]
+
+    last_modified = max(deployed_at, links_changed_at)
+    if page.last_published_at is not None:
+        last_modified = max(last_modified, page.last_published_at.timestamp())
+
+    return etag, int(last_modified)
+
+
+def set_validator_headers(response, etag, last_modified):
+    """Add ETag and Last-Modified, and make clients revalidate before reuse."""
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+BLOCK_KEY_PREFIX = "home:block"
+
+fragment_stats = Counter()
+
+
+def get_block_cache():
+    """Return the cache backend used for rendered block fragments."""
+    return caches[getattr(settings, "BLOCK_CACHE_ALIAS", "default")]
+
+
+def get_fragment_cache_key(block_type, digest):
+    return f"{BLOCK_KEY_PREFIX}:{block_type}:{digest}"
+
+
+def get_fragment(block_type, digest):
+    """Return a cached block fragment, counting the lookup as a hit or miss."""
+    html = get_block_cache().get(get_fragment_cache_key(block_type, digest))
+    fragment_stats[(block_type, "hit" if html is not None else "miss")] += 1
+    return html
+
+
+def set_fragment(block_type, digest, html):
+    get_block_cache().set(
+        get_fragment_cache_key(block_type, digest),
+        str(html),
+        getattr(settings, "BLOCK_CACHE_TIMEOUT", None),
+    )
+
+
+REFERENCE_KEY_PREFIX = "home:refs"
+
+
+def _reference_key(label, pk):
+    return f"{REFERENCE_KEY_PREFIX}:{label}:{pk}"
+
+
+def get_reference_versions(references):
+    """
+    Random tokens of the ``(model label, pk)`` references, in a stable order.
+    Cache keys of rich text and fragments include the tokens of the objects
+    they link to, ``invalidate_references()`` deletes a token to drop them.
+    """
+    cache = get_block_cache()
+    keys = sorted(_reference_key(label, pk) for label, pk in references)
+    versions = cache.get_many(keys) if keys else {}
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def linking_page_ids(label, pk):
+    """Ids of the pages linking to an object, from Wagtail's reference index."""
+    from django.apps import apps
+    from django.contrib.contenttypes.models import ContentType
+    from wagtail.models import Page, ReferenceIndex
+
+    return [
+        int(page_id)
+        for page_id in ReferenceIndex.objects.filter(
+            base_content_type=ContentType.objects.get_for_model(Page),
+            to_content_type=ContentType.objects.get_for_model(apps.get_model(label)),
+            to_object_id=pk,
+        )
+        .values_list("object_id", flat=True)
+        .distinct()
+    ]
+
+
+def invalidate_references(label, pk):
+    """
+    Drop cached rich text, fragments and pages linking to an object, returning
+    the ids of those pages.
+    """
+    get_block_cache().delete(_reference_key(label, pk))
+
+    page_ids = linking_page_ids(label, pk)
+    for page_id in page_ids:
+        invalidate_page(page_id)
+        links_changed(page_id)
+    return page_ids
+
+
+def fragment_cache_stats():
+    """Hits, misses and hit ratio per block type for this process."""
+    stats = {}
+    for (block_type, outcome), count in fragment_stats.items():
+        stats.setdefault(block_type, {"hit": 0, "miss": 0})[outcome] = count
+
+    for counts in stats.values():
+        total = counts["hit"] + counts["miss"]
+        counts["ratio"] = counts["hit"] / total if total else 0.0
+
+    return stats
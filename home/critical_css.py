@@ -0,0 +1,168 @@
+"""Critical (above the fold) CSS per page template, inlined by base.html."""
+
+import functools
+import json
+import re
+
+import rcssmin
+from bs4 import BeautifulSoup, Tag
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from soupsieve import SelectorSyntaxError
+
+from .cache import get_deploy_version
+from .export import render_live_page
+
+PSEUDO_ELEMENT = re.compile(
+    r"::?(before|after|first-line|first-letter|marker|placeholder|selection|backdrop)\b"
+)
+
+# At-rules whose nested rules are filtered like top-level rules
+CONDITIONAL_AT_RULES = ("@media", "@supports", "@layer", "@container")
+
+
+def parse_rules(css):
+    """
+    Split a stylesheet into ``(prelude, body)`` pairs. Statement at-rules such
+    as ``@import`` are returned with a body of ``None``.
+    """
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    rules = []
+    position = 0
+    while True:
+        start = css.find("{", position)
+        if start == -1:
+            break
+
+        *statements, prelude = css[position:start].split(";")
+        rules.extend((s.strip(), None) for s in statements if s.strip())
+
+        depth = 1
+        end = start + 1
+        while depth and end < len(css):
+            depth += {"{": 1, "}": -1}.get(css[end], 0)
+            end += 1
+
+        rules.append((prelude.strip(), css[start + 1 : end - 1]))
+        position = end
+
+    return rules
+
+
+def selector_matches(soups, selector):
+    """Whether ``selector`` matches anything in ``soups``, ignoring pseudo-elements."""
+    selector = PSEUDO_ELEMENT.sub("", selector).strip() or "*"
+    try:
+        return any(soup.select_one(selector) is not None for soup in soups)
+    except (SelectorSyntaxError, NotImplementedError):
+        # Keep rules we cannot evaluate rather than risk a flash of unstyled content
+        return True
+
+
+def select_rules(rules, soups):
+    selected = []
+    for prelude, body in rules:
+        if body is None:
+            selected.append(prelude + ";")
+        elif prelude.startswith(CONDITIONAL_AT_RULES):
+            nested = select_rules(parse_rules(body), soups)
+            if nested:
+                selected.append("%s{%s}" % (prelude, nested))
+        elif prelude.startswith("@") or any(
+            selector_matches(soups, s) for s in prelude.split(",")
+        ):
+            selected.append("%s{%s}" % (prelude, body))
+
+    return "".join(selected)
+
+
+# Shown without any content of their own
+REPLACED_ELEMENTS = {"canvas", "hr", "iframe", "img", "input", "picture", "svg", "video"}
+
+
+def is_placeholder(element):
+    """
+    Whether ``element`` takes no space until a script fills it in, such as
+    the user bar placeholder, or is empty.
+    """
+    if element.has_attr("data-userbar"):
+        return True
+    return (
+        element.name not in REPLACED_ELEMENTS
+        and element.find() is None
+        and not element.get_text(strip=True)
+    )
+
+
+def above_the_fold(html):
+    """
+    Parse ``html``, keeping only the first top-level elements of ``<body>``.
+    Placeholders before the fold are kept without counting them, they do not
+    push the content down.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    if soup.body is not None:
+        elements = [child for child in soup.body.children if isinstance(child, Tag)]
+        count = 0
+        for element in elements:
+            if count >= settings.CRITICAL_CSS_FOLD_ELEMENTS:
+                element.decompose()
+            elif not is_placeholder(element):
+                count += 1
+
+    return soup
+
+
+def extract_critical_css(css, documents):
+    """CSS rules from ``css`` needed to render the top of any of ``documents``."""
+    soups = [above_the_fold(html) for html in documents]
+    return rcssmin.cssmin(select_rules(parse_rules(css), soups))
+
+
+def build_critical_css():
+    """Render a sample of live pages per template and extract their critical CSS."""
+    from django.test import RequestFactory
+    from wagtail.models import get_page_models
+
+    with open(finders.find("styles.css"), encoding="utf-8") as f:
+        css = f.read()
+
+    request = RequestFactory().get("/")
+    documents = {}
+    for model in get_page_models():
+        pages = model.objects.live().exact_type(model).order_by("path")
+        for page in pages[: settings.CRITICAL_CSS_SAMPLE_PAGES]:
+            if page.get_url_parts() is None:
+                continue
+            template = page.get_template(request)
+            documents.setdefault(template, []).append(render_live_page(page))
+
+    return {
+        template: extract_critical_css(css, html)
+        for template, html in documents.items()
+    }
+
+
+def write_critical_css(templates):
+    with open(settings.CRITICAL_CSS_PATH, "w") as f:
+        json.dump(
+            {"fingerprint": get_deploy_version()[0], "templates": templates}, f, indent=2
+        )
+    load_critical_css.cache_clear()
+
+
+@functools.cache
+def load_critical_css():
+    """
+    Critical CSS per template, or an empty dict if it was built for other
+    templates or styles than the ones deployed.
+    """
+    try:
+        with open(settings.CRITICAL_CSS_PATH) as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    if data.get("fingerprint") != get_deploy_version()[0]:
+        return {}
+    return data["templates"]
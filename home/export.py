@@ -0,0 +1,157 @@
+"""Render live pages to static files for serving from a plain file server."""
+
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+
+MANIFEST_NAME = ".export-manifest.json"
+
+
+def init_worker():
+    """Set up Django in a freshly started export worker process."""
+    import django
+
+    django.setup()
+
+
+def template_dirs():
+    """Template directories belonging to this project, as opposed to Wagtail's."""
+    from django.apps import apps
+
+    dirs = [d for engine in settings.TEMPLATES for d in engine.get("DIRS", [])]
+    for app_config in apps.get_app_configs():
+        if app_config.path.startswith(settings.BASE_DIR):
+            dirs.append(os.path.join(app_config.path, "templates"))
+
+    return [d for d in dirs if os.path.isdir(d)]
+
+
+def directories_fingerprint(directories):
+    """Hash of every file below ``directories`` and the newest modification time."""
+    digest = hashlib.sha256()
+    newest = 0.0
+    for directory in sorted(directories):
+        for root, subdirs, files in os.walk(directory):
+            subdirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, directory).encode())
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+                newest = max(newest, os.path.getmtime(path))
+
+    return digest.hexdigest(), newest
+
+
+def templates_fingerprint():
+    """Hash of every project template, so a template change rebuilds all pages."""
+    return directories_fingerprint(template_dirs())[0]
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"templates": None, "pages": {}}
+
+
+def write_manifest(output_dir, manifest):
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def page_output_path(page_path):
+    """Relative file path for a page URL path, e.g. ``/about/`` -> ``about/index.html``."""
+    return os.path.join(page_path.strip("/"), "index.html")
+
+
+def anonymous_request(page):
+    """A GET request for a live page from an anonymous visitor."""
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    site_id, root_url, page_path = page.get_url_parts()
+    root = urlsplit(root_url)
+
+    request = RequestFactory().get(
+        page_path,
+        HTTP_HOST=root.netloc,
+        secure=root.scheme == "https",
+    )
+    request.user = AnonymousUser()
+    return request
+
+
+def render_live_page(page):
+    """Render a live page as an anonymous visitor would see it, returning bytes."""
+    response = page.serve(anonymous_request(page))
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    if hasattr(response, "render"):
+        response.render()
+
+    return response.content
+
+
+def render_page(page_id, output_dir):
+    """Render a single live page and write it below ``output_dir``."""
+    from wagtail.models import Page
+
+    page = Page.objects.get(pk=page_id).specific
+    relative_path = page_output_path(page.get_url_parts()[2])
+    path = os.path.join(output_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(render_live_page(page))
+
+    return page_id, relative_path
+
+
+def sync_tree(source, destination):
+    """Copy files from ``source`` whose size or modification time changed."""
+    copied = 0
+    for root, subdirs, files in os.walk(source):
+        target_root = os.path.join(destination, os.path.relpath(root, source))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            src = os.path.join(root, name)
+            dst = os.path.join(target_root, name)
+            src_stat = os.stat(src)
+            try:
+                dst_stat = os.stat(dst)
+                if (
+                    dst_stat.st_size == src_stat.st_size
+                    and dst_stat.st_mtime >= src_stat.st_mtime
+                ):
+                    continue
+            except FileNotFoundError:
+                pass
+            shutil.copy2(src, dst)
+            copied += 1
+
+    return copied
+
+
+def write_sitemap(output_dir, pages):
+    """Write ``sitemap.xml`` for ``(full_url, last_published_at)`` pairs."""
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for url, last_published_at in pages:
+        lines.append("  <url>")
+        lines.append(f"    <loc>{escape(url)}</loc>")
+        if isinstance(last_published_at, datetime):
+            lines.append(f"    <lastmod>{last_published_at.date().isoformat()}</lastmod>")
+        lines.append("  </url>")
+    lines.append("</urlset>")
+
+    with open(os.path.join(output_dir, "sitemap.xml"), "w") as f:
+        f.write("\n".join(lines) + "\n")
@@ -0,0 +1,83 @@
+"""Self-hosted web fonts, subset to the characters the site actually uses."""
+
+import functools
+import html
+import json
+import os
+
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import strip_tags
+from fontTools import subset
+from wagtail.rich_text import RichText
+
+from .blocks import live_stream_values, walk_blocks
+from .export import template_dirs
+
+MANIFEST_NAME = "fonts.json"
+
+# Always kept, so new content using common Latin text renders before the fonts
+# are subset again: Basic Latin, Latin-1 Supplement and General Punctuation.
+BASE_CHARACTERS = "".join(
+    chr(c) for c in [*range(0x20, 0x7F), *range(0xA0, 0x100), *range(0x2000, 0x2070)]
+)
+
+
+def collect_site_text():
+    """Every character in live StreamField content and the project templates."""
+    characters = set(BASE_CHARACTERS)
+
+    for stream_value in live_stream_values():
+        for block, value in walk_blocks(stream_value.stream_block, stream_value):
+            if isinstance(value, RichText):
+                value = value.source
+            if isinstance(value, str):
+                characters.update(html.unescape(strip_tags(value)))
+
+    for directory in template_dirs():
+        for root, subdirs, files in os.walk(directory):
+            for name in files:
+                with open(os.path.join(root, name), encoding="utf-8") as f:
+                    characters.update(f.read())
+
+    return "".join(sorted(c for c in characters if c.isprintable()))
+
+
+def subset_font(source, destination, text):
+    """Write a WOFF2 subset of ``source`` containing the glyphs for ``text``."""
+    options = subset.Options()
+    options.flavor = "woff2"
+    # Keep OpenType features such as kerning and ligatures
+    options.layout_features = ["*"]
+
+    font = subset.load_font(source, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    subset.save_font(font, destination, options)
+
+
+def font_filename(font):
+    family = font["family"].lower().replace(" ", "-")
+    return f"{family}-{font.get('style', 'normal')}.woff2"
+
+
+def write_manifest(fonts):
+    with open(os.path.join(settings.FONTS_OUTPUT_DIR, MANIFEST_NAME), "w") as f:
+        json.dump(fonts, f, indent=2)
+    get_self_hosted_fonts.cache_clear()
+
+
+@functools.cache
+def get_self_hosted_fonts():
+    """
+    Fonts generated by the ``subset_fonts`` command, with their static URLs,
+    or an empty list if the command has not been run.
+    """
+    try:
+        with open(os.path.join(settings.FONTS_OUTPUT_DIR, MANIFEST_NAME)) as f:
+            fonts = json.load(f)
+    except FileNotFoundError:
+        return []
+
+    return [{**font, "url": static(f"fonts/{font['file']}")} for font in fonts]
@@ -0,0 +1,22 @@
+"""Frontend cache backend for the page cache of the ASGI application."""
+
+from urllib.parse import urlsplit
+
+from wagtail.contrib.frontend_cache.backends import BaseBackend
+
+from .cache import purge_url
+
+
+class PageCacheBackend(BaseBackend):
+    """
+    Purge URLs from the responses ``home.asgi.CachedPageApplication`` serves
+    without Django, a local stand-in for a caching reverse proxy. Configure a
+    proxy or CDN backend next to it in ``WAGTAILFRONTENDCACHE`` when there is one.
+    """
+
+    def purge(self, url):
+        parts = urlsplit(url)
+        path = parts.path
+        if parts.query:
+            path += "?" + parts.query
+        purge_url(parts.netloc, path)
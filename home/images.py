@@ -0,0 +1,120 @@
+"""Image renditions needed to render StreamField content."""
+
+from contextlib import contextmanager
+
+from wagtail.images import get_image_model
+from wagtail.images.blocks import ImageChooserBlock
+
+from .blocks import live_stream_values, prefetched_images, walk_blocks, walk_raw_blocks
+from .tasks import task
+
+
+def collect_rendition_requests(stream_value):
+    """
+    Map every image referenced from a StreamField value to the set of filter
+    specs its block templates will request.
+    """
+    requests = {}
+    for block, value in walk_blocks(stream_value.stream_block, stream_value):
+        if hasattr(block, "get_rendition_requests"):
+            for image, filters in block.get_rendition_requests(value):
+                requests.setdefault(image, set()).update(filters)
+
+    return requests
+
+
+def generate_renditions(stream_value):
+    """Create any missing renditions for a StreamField value ahead of rendering."""
+    for image, filters in collect_rendition_requests(stream_value).items():
+        image.get_renditions(*sorted(filters))
+
+
+# Image processing takes a lot of memory, keep it to a few workers at a time
+@task(concurrency=2)
+def generate_page_renditions(page_id):
+    """Generate the renditions for the StreamFields of a live page."""
+    from wagtail.fields import StreamField
+    from wagtail.models import Page
+
+    page = Page.objects.live().filter(pk=page_id).first()
+    if page is None:
+        return
+
+    page = page.specific
+    for field in page._meta.get_fields():
+        if isinstance(field, StreamField):
+            generate_renditions(getattr(page, field.name))
+
+
+@contextmanager
+def prefetch_images(stream_value):
+    """
+    Load every image referenced from a StreamField value, with the renditions
+    its blocks need, in a constant number of queries.
+
+    Image chooser blocks converted while the context is active use these
+    instances instead of querying for their image one by one.
+    """
+    image_ids = set()
+    filters = set()
+    for block, raw_value in walk_raw_blocks(stream_value.stream_block, stream_value.raw_data):
+        if isinstance(block, ImageChooserBlock) and raw_value is not None:
+            image_ids.add(raw_value)
+        if hasattr(block, "get_rendition_filters"):
+            filters.update(block.get_rendition_filters())
+
+    images = {}
+    if image_ids:
+        images = (
+            get_image_model()
+            .objects.filter(pk__in=image_ids)
+            .prefetch_renditions(*sorted(filters))
+            .in_bulk()
+        )
+
+    token = prefetched_images.set(images)
+    try:
+        yield images
+    finally:
+        prefetched_images.reset(token)
+
+
+def collect_site_rendition_requests():
+    """Rendition requests for the StreamFields of every live page."""
+    requests = {}
+    for stream_value in live_stream_values():
+        for image, filters in collect_rendition_requests(stream_value).items():
+            requests.setdefault(image, set()).update(filters)
+
+    return requests
+
+
+def find_missing_filters(image, filters):
+    """
+    Filter specs without a usable rendition for ``image``.
+
+    Renditions whose file is gone, e.g. after a media wipe, are deleted so they
+    get generated again.
+    """
+    from wagtail.images.models import Filter
+
+    filter_objects = [Filter(spec=spec) for spec in sorted(filters)]
+    existing = image.find_existing_renditions(*filter_objects)
+
+    missing = []
+    for filter_object in filter_objects:
+        rendition = existing.get(filter_object)
+        if rendition is not None and rendition.file.storage.exists(rendition.file.name):
+            continue
+        if rendition is not None:
+            rendition.delete()
+        missing.append(filter_object.spec)
+
+    return missing
+
+
+def generate_image_renditions(image_id, filters):
+    """Worker entry point: create the given renditions for a single image."""
+    image = get_image_model().objects.get(pk=image_id)
+    image.get_renditions(*filters)
+    return image_id, len(filters)
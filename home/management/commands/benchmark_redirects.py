@@ -0,0 +1,137 @@
+import json
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpResponseNotFound
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from wagtail.contrib.redirects.middleware import RedirectMiddleware
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.models import Site
+
+from resolve.middleware import CachedRedirectMiddleware
+from resolve.redirects import RedirectTable, bump_redirect_version, get_redirect_table
+
+# An isolated cache for the redirect table version
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark_redirects',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks redirect lookups for 404s against a large redirect table, '
+        'with Wagtail\'s middleware and with the in-memory table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=100_000,
+            help='Number of redirects to create, one in a hundred is a wildcard',
+        )
+        parser.add_argument(
+            '--lookups',
+            type=int,
+            default=1000,
+            help='Number of 404s per kind of lookup',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write the JSON results to',
+        )
+
+    def handle(self, *args, **options):
+        # Nothing is kept, the redirects are rolled back afterwards
+        with override_settings(CACHES=BENCHMARK_CACHES), transaction.atomic():
+            results = self.run(options['count'], options['lookups'])
+            transaction.set_rollback(True)
+
+        for name, result in results['lookups'].items():
+            self.stdout.write(
+                f'{name}: {result["us_per_lookup"]:.1f}µs and '
+                f'{result["queries_per_lookup"]:.2f} queries per 404'
+            )
+        self.stdout.write(
+            f'Table of {results["redirects"]} redirects built in '
+            f'{results["build_ms"]:.0f}ms, {results["table_mb"]:.1f}MB'
+        )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def run(self, count, lookups):
+        site = Site.objects.get(is_default_site=True)
+        Redirect.objects.bulk_create(
+            Redirect(
+                old_path=f'/old/{i}/*' if i % 100 == 0 else f'/old/{i}',
+                site=site if i % 2 else None,
+                redirect_link=f'https://example.com/{i}',
+            )
+            for i in range(count)
+        )
+        # bulk_create() sends no signals
+        bump_redirect_version()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        table = RedirectTable.load()
+        build = time.perf_counter() - started
+        table_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del table
+
+        rng = random.Random(0)
+        paths = {
+            'miss': [f'/missing/{i}' for i in range(lookups)],
+            'hit': [f'/old/{rng.randrange(1, count)}' for i in range(lookups)],
+            'wildcard_hit': [
+                f'/old/{rng.randrange(0, count, 100)}/below' for i in range(lookups)
+            ],
+        }
+        middleware = {
+            'wagtail': RedirectMiddleware(HttpResponseNotFound),
+            'table': CachedRedirectMiddleware(HttpResponseNotFound),
+        }
+        # Load the table before timing, as a worker would on its first 404
+        get_redirect_table()
+
+        results = {}
+        for kind, kind_paths in paths.items():
+            for name, instance in middleware.items():
+                results[f'{name}_{kind}'] = self.measure(instance, site, kind_paths)
+
+        return {
+            'redirects': count,
+            'build_ms': build * 1000,
+            'table_mb': table_bytes / 1024 / 1024,
+            'lookups': results,
+        }
+
+    def measure(self, middleware, site, paths):
+        factory = RequestFactory()
+        requests = []
+        for path in paths:
+            request = factory.get(path)
+            # Wagtail's serve view found the site before returning the 404
+            request._wagtail_site = site
+            requests.append(request)
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for request in requests:
+                middleware.process_response(request, HttpResponseNotFound())
+            elapsed = time.perf_counter() - started
+
+        return {
+            'us_per_lookup': elapsed / len(paths) * 1_000_000,
+            'queries_per_lookup': len(queries) / len(paths),
+        }
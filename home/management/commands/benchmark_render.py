@@ -0,0 +1,191 @@
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import django
+import wagtail
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from wagtail.images.models import Image
+from wagtail.models import Site
+
+from home.cache import get_block_cache, get_page_cache
+from home.export import render_live_page
+from home.materialize import discard_bodies
+from home.models import HomePage
+from home.synthetic import generate_body, generate_image_file
+
+# Isolated caches, so the benchmark neither reads nor clears the site's caches.
+# Pages and blocks get separate ones so pages can be cleared on their own.
+BENCHMARK_CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'benchmark_render_{alias}',
+        # Large bodies hold more fragments than the default 300 entries
+        'OPTIONS': {'MAX_ENTRIES': 1_000_000},
+    }
+    for alias in ('default', 'pages', 'blocks')
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks rendering synthetic homepages of growing size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=lambda value: [int(size) for size in value.split(',')],
+            default=[10, 100, 1000, 5000],
+            help='Comma separated numbers of top-level blocks to benchmark',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Number of timed renders per size, the median is reported',
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=4,
+            help='Number of distinct images used by two column blocks',
+        )
+        parser.add_argument(
+            '--output',
+            default='render-benchmark.json',
+            help='File the JSON results are written to',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON results of an earlier run to compare against',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The render benchmark only runs against SQLite')
+
+        site = Site.objects.filter(is_default_site=True).first()
+        if site is None:
+            raise CommandError('No default site to add benchmark pages to')
+
+        # Everything is created in a transaction that is rolled back, and
+        # images are written to a temporary media root
+        with (
+            tempfile.TemporaryDirectory() as media_root,
+            override_settings(
+                MEDIA_ROOT=media_root,
+                CACHES=BENCHMARK_CACHES,
+                PAGE_CACHE_ALIAS='pages',
+                BLOCK_CACHE_ALIAS='blocks',
+            ),
+            transaction.atomic(),
+        ):
+            image_ids = [
+                Image.objects.create(
+                    title=f'Benchmark image {i}',
+                    file=generate_image_file(f'benchmark-{i}.png', seed=i),
+                ).pk
+                for i in range(options['images'])
+            ]
+            results = [
+                self.benchmark(site.root_page, size, image_ids, options['repeat'])
+                for size in options['sizes']
+            ]
+            transaction.set_rollback(True)
+
+        report = {
+            'revision': git_revision(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'wagtail': wagtail.__version__,
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        baseline = {}
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = {r['blocks']: r for r in json.load(f)['results']}
+
+        for result in results:
+            self.stdout.write(self.format_result(result, baseline.get(result['blocks'])))
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote results to {options["output"]}'))
+
+    def benchmark(self, parent, size, image_ids, repeat):
+        page = HomePage(title=f'Benchmark {size}', slug=f'benchmark-{size}')
+        parent.add_child(instance=page)
+        page.body = generate_body(size, image_ids, seed=size)
+        page.save_revision().publish()
+        page.refresh_from_db()
+
+        def clear_caches():
+            get_page_cache().clear()
+            get_block_cache().clear()
+            # Otherwise the body stored by the first render is served instead
+            discard_bodies([page.pk])
+
+        # Untimed render measuring queries and memory, tracing slows it down
+        clear_caches()
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                html = render_live_page(page)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        cold = []
+        warm = []
+        for _ in range(repeat):
+            clear_caches()
+            cold.append(self.time_render(page))
+            # Block fragments are cached now, only the page itself is rendered
+            get_page_cache().clear()
+            discard_bodies([page.pk])
+            warm.append(self.time_render(page))
+
+        return {
+            'blocks': size,
+            'html_bytes': len(html),
+            'queries': len(queries),
+            'peak_memory_bytes': peak_memory,
+            'render_seconds': statistics.median(cold),
+            'warm_render_seconds': statistics.median(warm),
+        }
+
+    def time_render(self, page):
+        started = time.perf_counter()
+        render_live_page(page)
+        return time.perf_counter() - started
+
+    def format_result(self, result, baseline=None):
+        line = (
+            f'{result["blocks"]:>6} blocks: '
+            f'{result["render_seconds"] * 1000:9.1f}ms cold, '
+            f'{result["warm_render_seconds"] * 1000:9.1f}ms warm, '
+            f'{result["queries"]:>4} queries, '
+            f'{result["peak_memory_bytes"] / 1024 / 1024:7.1f}MiB peak'
+        )
+        if baseline:
+            change = result['render_seconds'] / baseline['render_seconds'] - 1
+            line += f' ({change:+.1%} cold render)'
+        return line
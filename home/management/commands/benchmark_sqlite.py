@@ -0,0 +1,189 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from home.signals import sqlite_pragmas
+
+# Roughly what serving a page does: find the site, route to the page, load it
+READ_QUERIES = [
+    ('SELECT * FROM wagtailcore_site WHERE is_default_site = 1', False),
+    ('SELECT * FROM wagtailcore_page WHERE url_path = ?', True),
+    (
+        'SELECT home_homepage.body FROM home_homepage '
+        'INNER JOIN wagtailcore_page ON wagtailcore_page.id = home_homepage.page_ptr_id '
+        'WHERE wagtailcore_page.url_path = ?',
+        True,
+    ),
+]
+
+# Roughly what publishing a page does: rewrite its row and body
+WRITE_QUERIES = [
+    'UPDATE wagtailcore_page SET last_published_at = CURRENT_TIMESTAMP '
+    'WHERE url_path = ?',
+    'UPDATE home_homepage SET body = body WHERE page_ptr_id = '
+    '(SELECT id FROM wagtailcore_page WHERE url_path = ?)',
+]
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(path, isolation_level=None)
+    for statement in sqlite_pragmas(pragmas):
+        connection.execute(statement)
+    return connection
+
+
+def run_worker(role, path, pragmas, persistent, url_paths, duration):
+    """
+    Run requests until ``duration`` has passed, returning the number that
+    succeeded and the number that failed on a locked database.
+    """
+    rng = random.Random(os.getpid())
+    deadline = time.monotonic() + duration
+    persistent_connection = connect(path, pragmas) if persistent else None
+    done = failed = 0
+
+    while time.monotonic() < deadline:
+        url_path = rng.choice(url_paths)
+        connection = persistent_connection
+        try:
+            # Without persistent connections, every request opens a new one
+            connection = connection or connect(path, pragmas)
+            if role == 'reader':
+                for sql, has_param in READ_QUERIES:
+                    connection.execute(sql, (url_path,) if has_param else ()).fetchall()
+            else:
+                connection.execute('BEGIN IMMEDIATE')
+                for sql in WRITE_QUERIES:
+                    connection.execute(sql, (url_path,))
+                connection.execute('COMMIT')
+            done += 1
+        except sqlite3.OperationalError:
+            if connection is not None and connection.in_transaction:
+                connection.execute('ROLLBACK')
+            failed += 1
+        finally:
+            if connection is not None and connection is not persistent_connection:
+                connection.close()
+
+    return role, done, failed
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks concurrent page reads and admin writes on a copy of the '
+        'SQLite database, with default settings and with SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=4,
+            help='Number of reading processes, like gunicorn workers',
+        )
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=1,
+            help='Number of writing processes, like editors publishing pages',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=5,
+            help='Seconds to run each configuration for',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write the JSON results to',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor != 'sqlite':
+            raise CommandError('The default database is not SQLite')
+
+        database = settings.DATABASES['default']
+        profiles = {
+            # SQLite and Django defaults: a connection per request, no pragmas
+            'default': ({}, False),
+            'tuned': (
+                getattr(settings, 'SQLITE_PRAGMAS', {}),
+                database.get('CONN_MAX_AGE', 0) != 0,
+            ),
+        }
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name, (pragmas, persistent) in profiles.items():
+                # Each profile gets a fresh copy, the journal mode is stored in
+                # the file. serialize() also works inside a transaction, where
+                # backup() would wait for the write lock forever.
+                path = os.path.join(directory, f'{name}.sqlite3')
+                connection.ensure_connection()
+                with open(path, 'wb') as f:
+                    f.write(connection.connection.serialize())
+
+                with sqlite3.connect(path) as copy:
+                    # Set up front, switching needs the database to itself
+                    copy.execute(
+                        f"PRAGMA journal_mode = {pragmas.get('journal_mode', 'delete')}"
+                    )
+                    url_paths = [
+                        row[0] for row in copy.execute(
+                            'SELECT url_path FROM wagtailcore_page '
+                            'INNER JOIN home_homepage ON page_ptr_id = id WHERE live = 1'
+                        )
+                    ]
+                if not url_paths:
+                    raise CommandError('There are no live pages to read')
+
+                results[name] = self.run_profile(path, pragmas, persistent, url_paths, options)
+                self.stdout.write(self.format_result(name, results[name]))
+
+        gain = results['tuned']['reads_per_second'] / max(results['default']['reads_per_second'], 1)
+        self.stdout.write(self.style.SUCCESS(f'Tuned reads: {gain:.1f}x the default'))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def run_profile(self, path, pragmas, persistent, url_paths, options):
+        roles = ['reader'] * options['readers'] + ['writer'] * options['writers']
+        totals = {role: [0, 0] for role in ('reader', 'writer')}
+
+        with ProcessPoolExecutor(max_workers=len(roles)) as executor:
+            futures = [
+                executor.submit(
+                    run_worker, role, path, pragmas, persistent, url_paths, options['duration']
+                )
+                for role in roles
+            ]
+            for future in futures:
+                role, done, failed = future.result()
+                totals[role][0] += done
+                totals[role][1] += failed
+
+        duration = options['duration']
+        return {
+            'pragmas': pragmas,
+            'persistent_connections': persistent,
+            'reads_per_second': totals['reader'][0] / duration,
+            'writes_per_second': totals['writer'][0] / duration,
+            'locked_errors': totals['reader'][1] + totals['writer'][1],
+        }
+
+    def format_result(self, name, result):
+        return (
+            f'{name:>8}: {result["reads_per_second"]:9.1f} reads/s, '
+            f'{result["writes_per_second"]:7.1f} writes/s, '
+            f'{result["locked_errors"]} locked errors'
+        )
@@ -0,0 +1,124 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter per measurement, so nothing is imported yet
+CHILD = '''
+import json, resource, sys, time
+
+
+def rss_mb():
+    # Current resident size where /proc exists, the peak elsewhere
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+started = time.perf_counter()
+import django
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+
+application = get_wsgi_application()
+get_resolver().url_patterns
+startup = time.perf_counter() - started
+startup_rss = rss_mb()
+modules = len(sys.modules)
+
+from django.test import Client, override_settings
+
+override_settings(SECRET_KEY="benchmark-startup", ALLOWED_HOSTS=["*"]).enable()
+client = Client()
+timings = []
+for path in sys.argv[1:]:
+    started = time.perf_counter()
+    status = client.get(path).status_code
+    timings.append(time.perf_counter() - started)
+    if status != 200:
+        sys.exit(f"{path} returned {status}")
+
+print(json.dumps({
+    "startup_ms": startup * 1000,
+    "modules": modules,
+    "apps": len(django.apps.apps.get_app_configs()),
+    "startup_rss_mb": startup_rss,
+    "first_request_ms": timings[0] * 1000,
+    "rss_mb": rss_mb(),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the startup time, imported modules and memory use of a worker '
+        'with the full and the public settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-modules',
+            default='resolve.settings.production,resolve.settings.public',
+            help='Comma separated settings modules to compare',
+        )
+        parser.add_argument(
+            '--paths',
+            default='/',
+            help='Comma separated URL paths each worker serves after starting',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Number of fresh processes per settings module, the median is reported',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write the JSON results to',
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'].split(',')
+        results = {}
+
+        for module in options['settings_modules'].split(','):
+            runs = [self.measure(module, paths) for _ in range(options['repeat'])]
+            results[module] = {
+                key: statistics.median(run[key] for run in runs) for key in runs[0]
+            }
+            self.stdout.write(self.format_result(module, results[module]))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def measure(self, module, paths):
+        process = subprocess.run(
+            [sys.executable, '-c', CHILD, *paths],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': module},
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            raise CommandError(f'{module} failed:\n{process.stderr.strip()}')
+
+        # Production settings log a line per request before the results
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def format_result(self, module, result):
+        return (
+            f'{module}: started in {result["startup_ms"]:.0f}ms with '
+            f'{result["apps"]:.0f} apps and {result["modules"]:.0f} modules, '
+            f'{result["startup_rss_mb"]:.1f}MB; first request '
+            f'{result["first_request_ms"]:.0f}ms, {result["rss_mb"]:.1f}MB'
+        )
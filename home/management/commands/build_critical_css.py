@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home.critical_css import build_critical_css, write_critical_css
+
+
+class Command(BaseCommand):
+    help = 'Extracts the above the fold CSS of every page template'
+
+    def handle(self, *args, **options):
+        templates = build_critical_css()
+        for template, css in sorted(templates.items()):
+            self.stdout.write(f'{template}: {len(css)} bytes of critical CSS')
+
+        write_critical_css(templates)
+        self.stdout.write(
+            self.style.SUCCESS(f'Wrote critical CSS to {settings.CRITICAL_CSS_PATH}')
+        )
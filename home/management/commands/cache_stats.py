@@ -0,0 +1,40 @@
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from resolve.cache import TieredCache
+
+
+class Command(BaseCommand):
+    help = 'Shows the hit ratios and evictions of the tiered caches, summed over all workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Write the statistics as JSON',
+        )
+
+    def handle(self, *args, **options):
+        stats = {
+            alias: caches[alias].shared_stats()
+            for alias in settings.CACHES
+            if isinstance(caches[alias], TieredCache)
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+
+        if not stats:
+            self.stdout.write('No tiered caches are configured')
+        for alias, counts in stats.items():
+            self.stdout.write(
+                f'{alias}: {counts["hit_ratio"]:.1%} hits, '
+                f'{counts["l1_hit_ratio"]:.1%} in process '
+                f'({counts["l1_hits"]} L1, {counts["l2_hits"]} L2, '
+                f'{counts["misses"]} misses), {counts["l1_evictions"]} L1 evictions, '
+                f'{counts["sets"]} sets, {counts["deletes"]} deletes'
+            )
@@ -0,0 +1,129 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from wagtail.models import Page
+
+from home.export import (
+    init_worker,
+    load_manifest,
+    page_output_path,
+    render_page,
+    sync_tree,
+    templates_fingerprint,
+    write_manifest,
+    write_sitemap,
+)
+
+
+class Command(BaseCommand):
+    help = 'Renders all live pages and their assets to static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=settings.STATIC_EXPORT_ROOT,
+            help='Directory to write the static site to',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes used to render pages',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Render every page, even if it did not change since the last export',
+        )
+        parser.add_argument(
+            '--skip-assets',
+            action='store_true',
+            help='Do not collect static files and media into the output directory',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        output_dir = options['output']
+        os.makedirs(output_dir, exist_ok=True)
+
+        manifest = load_manifest(output_dir)
+        fingerprint = templates_fingerprint()
+        templates_changed = manifest['templates'] != fingerprint
+        if templates_changed and manifest['templates'] is not None:
+            self.stdout.write('Templates changed, rendering all pages')
+
+        # Work out which pages are exported and which of those changed
+        exported = {}
+        sitemap = []
+        stale = []
+        for page in Page.objects.live().public().filter(depth__gt=1).order_by('path'):
+            url_parts = page.get_url_parts()
+            if url_parts is None or url_parts[2] is None:
+                continue
+
+            site_id, root_url, page_path = url_parts
+            relative_path = page_output_path(page_path)
+            entry = {'revision': page.live_revision_id, 'path': relative_path}
+            exported[str(page.pk)] = entry
+            sitemap.append((root_url + page_path, page.last_published_at))
+
+            if (
+                options['force']
+                or templates_changed
+                or manifest['pages'].get(str(page.pk)) != entry
+                or not os.path.exists(os.path.join(output_dir, relative_path))
+            ):
+                stale.append(page.pk)
+
+        # Remove pages that are no longer live
+        current_paths = {entry['path'] for entry in exported.values()}
+        for page_id, entry in manifest['pages'].items():
+            if page_id not in exported and entry['path'] not in current_paths:
+                try:
+                    os.remove(os.path.join(output_dir, entry['path']))
+                    self.stdout.write(f'Removed {entry["path"]}')
+                except FileNotFoundError:
+                    pass
+
+        # Render changed pages
+        workers = min(options['workers'], len(stale))
+        if workers > 1:
+            # Worker processes must not share the parent's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+                results = executor.map(render_page, stale, [output_dir] * len(stale))
+                for page_id, relative_path in results:
+                    self.stdout.write(f'Rendered {relative_path}')
+        else:
+            for page_id in stale:
+                page_id, relative_path = render_page(page_id, output_dir)
+                self.stdout.write(f'Rendered {relative_path}')
+
+        # Copy static files and media
+        if not options['skip_assets']:
+            call_command('collectstatic', interactive=False, verbosity=0)
+            copied = sync_tree(
+                settings.STATIC_ROOT,
+                os.path.join(output_dir, settings.STATIC_URL.strip('/')),
+            )
+            if os.path.isdir(settings.MEDIA_ROOT):
+                copied += sync_tree(
+                    settings.MEDIA_ROOT,
+                    os.path.join(output_dir, settings.MEDIA_URL.strip('/')),
+                )
+            self.stdout.write(f'Copied {copied} asset files')
+
+        write_sitemap(output_dir, sitemap)
+        write_manifest(output_dir, {'templates': fingerprint, 'pages': exported})
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Exported {len(exported)} pages ({len(stale)} rendered) '
+                f'to {output_dir} in {time.monotonic() - started:.2f}s'
+            )
+        )
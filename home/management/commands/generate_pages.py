@@ -0,0 +1,112 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from wagtail.images.models import Image
+from wagtail.models import Page, Site
+
+from home.models import HomePage
+from home.synthetic import (
+    bulk_add_children,
+    generate_body,
+    generate_image_file,
+    sentence,
+)
+
+
+class Command(BaseCommand):
+    help = 'Generates live pages with deterministic synthetic content for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'count',
+            type=int,
+            help='Number of pages to generate',
+        )
+        parser.add_argument(
+            '--parent',
+            type=int,
+            help='Id of the parent page, defaults to the root page of the default site',
+        )
+        parser.add_argument(
+            '--blocks',
+            type=int,
+            default=10,
+            help='Average number of top-level blocks per page',
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=5,
+            help='Number of synthetic images shared by the pages',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed for the generated content, the same seed gives the same pages',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of pages inserted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        if options['parent']:
+            parent = Page.objects.filter(pk=options['parent']).first()
+        else:
+            site = Site.objects.filter(is_default_site=True).first()
+            parent = site.root_page if site else None
+        if parent is None:
+            raise CommandError('Parent page not found')
+
+        image_ids = [self.get_image(i).pk for i in range(options['images'])]
+
+        # Continue numbering after pages from earlier runs, so slugs stay unique
+        # and a run extends the site with the pages a larger run would have made
+        offset = parent.get_children().filter(slug__startswith='synthetic-').count()
+        count = options['count']
+        batch_size = options['batch_size']
+
+        for start in range(offset, offset + count, batch_size):
+            numbers = range(start, min(start + batch_size, offset + count))
+            bulk_add_children(
+                parent,
+                [self.build_page(n, image_ids, options) for n in numbers],
+            )
+            self.stdout.write(f'[{numbers[-1] - offset + 1}/{count}] pages')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Generated {count} pages below "{parent.title}" '
+                f'in {time.monotonic() - started:.2f}s'
+            )
+        )
+        self.stdout.write('Run update_index to add them to the search index')
+
+    def get_image(self, number):
+        title = f'Synthetic image {number}'
+        image = Image.objects.filter(title=title).first()
+        if image is None:
+            image = Image.objects.create(
+                title=title,
+                file=generate_image_file(f'synthetic-{number}.png', seed=number),
+            )
+        return image
+
+    def build_page(self, number, image_ids, options):
+        seed = f'{options["seed"]}-{number}'
+        rng = random.Random(seed)
+        title = sentence(rng, words=4).rstrip('.')
+        return HomePage(
+            title=title,
+            slug=f'synthetic-{number}',
+            search_description=sentence(rng, words=20),
+            body=generate_body(
+                rng.randint(1, options['blocks'] * 2 - 1), image_ids, seed=seed
+            ),
+        )
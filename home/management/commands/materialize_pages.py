@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from home.materialize import (
+    discard_bodies,
+    enqueue_materialize,
+    get_templates_fingerprint,
+    materialize,
+)
+from home.models import HomePage
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders and stores the body of every live page whose stored body is '
+        'missing, or was rendered for another revision or other templates'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Render every live page, even if its stored body is current',
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help=(
+                'Queue the pages for the run_tasks workers instead of rendering '
+                'them here, workers skip bodies stored in the meantime. With '
+                '--force the stored bodies are discarded first'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        pages = HomePage.objects.live().order_by('path')
+        if not options['force']:
+            pages = pages.exclude(
+                rendered_body__revision=F('live_revision'),
+                rendered_body__fingerprint=get_templates_fingerprint(),
+            )
+
+        if options['enqueue']:
+            page_ids = list(pages.values_list('pk', flat=True))
+            with transaction.atomic():
+                if options['force']:
+                    # Workers only render pages without a current body
+                    discard_bodies(page_ids)
+                enqueue_materialize(page_ids)
+            self.stdout.write(self.style.SUCCESS(f'Queued {len(page_ids)} page bodies'))
+            return
+
+        rendered = 0
+        for page in pages.iterator():
+            if materialize(page) is not None:
+                rendered += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rendered {rendered} page bodies in {time.monotonic() - started:.2f}s'
+            )
+        )
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from home.export import init_worker
+from home.tasks import run_pending, work
+
+
+def stop_on_signals(stop):
+    """Finish the running job, then exit, on SIGINT and SIGTERM."""
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop.set())
+
+
+def run_worker(stop, poll_interval):
+    """
+    Worker process entry point. Under the spawn and forkserver start methods
+    it starts without Django set up or the parent's signal handlers.
+    """
+    init_worker()
+    stop_on_signals(stop)
+    work(stop, poll_interval)
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the jobs queued after publishing, such as rendering page bodies '
+        'and image renditions, in worker processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait before looking for jobs again when none are due',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due in this process, then exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.stdout.write(self.style.SUCCESS(f'Ran {run_pending()} jobs'))
+            return
+
+        # Workers finish the job they are running, then exit
+        stop = multiprocessing.Event()
+        stop_on_signals(stop)
+
+        workers = max(options['workers'], 1)
+        self.stdout.write(f'Starting {workers} workers')
+        if workers == 1:
+            work(stop, options['poll_interval'])
+            return
+
+        # Worker processes must not share the parent's database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=run_worker, args=(stop, options['poll_interval']))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,53 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home.fonts import collect_site_text, font_filename, subset_font, write_manifest
+
+
+class Command(BaseCommand):
+    help = 'Subsets the self-hosted fonts to the characters used by the site'
+
+    def handle(self, *args, **options):
+        text = collect_site_text()
+        self.stdout.write(f'Found {len(text)} distinct characters')
+
+        os.makedirs(settings.FONTS_OUTPUT_DIR, exist_ok=True)
+        generated = []
+        for font in settings.FONTS:
+            source = os.path.join(settings.FONTS_SOURCE_DIR, font['file'])
+            if not os.path.exists(source):
+                self.stdout.write(
+                    self.style.WARNING(f'Font file not found at {source}')
+                )
+                continue
+
+            filename = font_filename(font)
+            destination = os.path.join(settings.FONTS_OUTPUT_DIR, filename)
+            subset_font(source, destination, text)
+            self.stdout.write(
+                f'Wrote {filename} ({os.path.getsize(source) // 1024} KB -> '
+                f'{os.path.getsize(destination) // 1024} KB)'
+            )
+
+            generated.append(
+                {
+                    'family': font['family'],
+                    'file': filename,
+                    'weight': font.get('weight', '400'),
+                    'style': font.get('style', 'normal'),
+                    'preload': font.get('preload', False),
+                }
+            )
+
+        if not generated:
+            self.stdout.write(
+                self.style.WARNING('No fonts generated, keeping the previous fonts')
+            )
+            return
+
+        write_manifest(generated)
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully subset {len(generated)} fonts')
+        )
@@ -0,0 +1,68 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from home.export import init_worker
+from home.images import (
+    collect_site_rendition_requests,
+    find_missing_filters,
+    generate_image_renditions,
+)
+
+
+class Command(BaseCommand):
+    help = 'Generates missing image renditions for all images used in live pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes used to generate renditions',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        # One job per image, get_renditions() opens and decodes the original
+        # once for all of its missing renditions
+        requests = collect_site_rendition_requests()
+        jobs = []
+        for image, filters in requests.items():
+            missing = find_missing_filters(image, filters)
+            if missing:
+                jobs.append((image.pk, missing))
+
+        total = sum(len(filters) for image_id, filters in jobs)
+        self.stdout.write(
+            f'Found {len(requests)} images, {total} missing renditions'
+        )
+
+        done = 0
+        workers = min(options['workers'], len(jobs))
+        if workers > 1:
+            # Worker processes must not share the parent's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+                futures = [
+                    executor.submit(generate_image_renditions, image_id, filters)
+                    for image_id, filters in jobs
+                ]
+                for future in as_completed(futures):
+                    image_id, count = future.result()
+                    done += count
+                    self.stdout.write(f'[{done}/{total}] Image {image_id}')
+        else:
+            for image_id, filters in jobs:
+                image_id, count = generate_image_renditions(image_id, filters)
+                done += count
+                self.stdout.write(f'[{done}/{total}] Image {image_id}')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Generated {done} renditions in {time.monotonic() - started:.2f}s'
+            )
+        )
@@ -0,0 +1,97 @@
+"""Body HTML rendered once per published revision and stored with it."""
+
+import functools
+
+from django.utils.safestring import mark_safe
+
+from .export import anonymous_request, templates_fingerprint
+from .images import prefetch_images
+from .tasks import task
+
+
+@functools.cache
+def get_templates_fingerprint():
+    """
+    Fingerprint of the project templates, stored with each rendered body so
+    a deploy with different templates makes them stale. Computed once per
+    process, templates only change on deploy.
+    """
+    return templates_fingerprint()
+
+
+def get_rendered_body(page):
+    """The stored body HTML of the live revision of ``page``, or ``None``."""
+    from .models import RenderedBody
+
+    if page.live_revision_id is None:
+        return None
+
+    html = (
+        RenderedBody.objects.filter(
+            page_id=page.pk,
+            revision_id=page.live_revision_id,
+            fingerprint=get_templates_fingerprint(),
+        )
+        .values_list("html", flat=True)
+        .first()
+    )
+    return mark_safe(html) if html is not None else None
+
+
+def render_body(page, context):
+    """Render the body blocks the way home_page.html includes them."""
+    return mark_safe("".join(str(block.render(context=context)) for block in page.body))
+
+
+def store_body(page, html):
+    """Store the body HTML of the live revision of ``page``."""
+    from .models import RenderedBody
+
+    if page.live_revision_id is None:
+        return
+
+    RenderedBody.objects.update_or_create(
+        page_id=page.pk,
+        defaults={
+            "revision_id": page.live_revision_id,
+            "fingerprint": get_templates_fingerprint(),
+            "html": html,
+        },
+    )
+
+
+def materialize(page):
+    """
+    Render and store the body of the live revision of ``page``. Pages
+    outside of every site are left to render on request.
+    """
+    if page.get_url_parts() is None:
+        return None
+
+    with prefetch_images(page.body):
+        html = render_body(page, page.get_context(anonymous_request(page)))
+    store_body(page, html)
+    return html
+
+
+@task()
+def materialize_page(page_id):
+    """Render and store the body of a live page, unless it is stored already."""
+    from .models import HomePage
+
+    page = HomePage.objects.live().filter(pk=page_id).first()
+    if page is not None and get_rendered_body(page) is None:
+        materialize(page)
+
+
+def enqueue_materialize(page_ids):
+    """Queue rendering the bodies of pages, once per page however often it changes."""
+    for page_id in page_ids:
+        materialize_page.enqueue(page_id, key=f"materialize:{page_id}")
+
+
+def discard_bodies(page_ids):
+    """Drop stored bodies, when their links changed. They render on the next request."""
+    from .models import RenderedBody
+
+    RenderedBody.objects.filter(page_id__in=page_ids).delete()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+import wagtail.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_alter_homepage_body'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='homepage',
+            name='body',
+            field=wagtail.fields.StreamField([('hero', 4), ('section', 25)], blank=True, block_lookup={0: ('wagtail.blocks.CharBlock', (), {'help_text': 'Main heading text', 'max_length': 255, 'required': True}), 1: ('wagtail.blocks.TextBlock', (), {'help_text': 'Body text for the hero section', 'required': True}), 2: ('wagtail.blocks.EmailBlock', (), {'help_text': 'Email address for contact', 'required': False}), 3: ('wagtail.blocks.CharBlock', (), {'help_text': 'Phone number for contact', 'max_length': 50, 'required': False}), 4: ('wagtail.blocks.StructBlock', [[('heading', 0), ('body_text', 1), ('cta_email', 2), ('cta_phone', 3)]], {}), 5: ('wagtail.blocks.CharBlock', (), {'help_text': 'Section title (h2)', 'max_length': 255, 'required': True}), 6: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('light', 'Light'), ('dark', 'Dark')], 'help_text': 'Section background color'}), 7: ('home.rich_text.MemoizedRichTextBlock', (), {'features': ['h4'], 'help_text': 'Heading (h4)'}), 8: ('home.rich_text.MemoizedRichTextBlock', (), {'features': ['bold', 'italic', 'link'], 'help_text': 'Paragraph of text'}), 9: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('3', '3 columns (h4 headings)'), ('4', '4 columns (h6 headings)')], 'help_text': 'Number of columns in grid layout'}), 10: ('wagtail.blocks.CharBlock', (), {'max_length': 100, 'required': True}), 11: ('home.rich_text.MemoizedRichTextBlock', (), {'features': ['bold', 'italic', 'link']}), 12: ('wagtail.blocks.StructBlock', [[('heading', 10), ('description', 11)]], {}), 13: ('wagtail.blocks.ListBlock', (12,), {}), 14: ('wagtail.blocks.StructBlock', [[('columns', 9), ('features', 13)]], {}), 15: ('wagtail.blocks.CharBlock', (), {'help_text': 'Definition term (dt)', 'max_length': 100, 'required': True}), 16: ('home.rich_text.MemoizedRichTextBlock', (), {'features': ['bold', 'italic', 'link'], 'help_text': 'Definition description (dd)', 'required': True}), 17: ('wagtail.blocks.StructBlock', [[('term', 15), ('definition', 16)]], {}), 18: ('wagtail.blocks.ListBlock', (17,), {}), 19: ('wagtail.blocks.StructBlock', [[('items', 18)]], {}), 20: ('wagtail.blocks.ChoiceBlock', [], {'choices': [('left', 'Image on left'), ('right', 'Image on right')], 'help_text': 'Which side to place the image'}), 21: ('home.blocks.PrefetchedImageChooserBlock', (), {'help_text': 'Image for the column', 'required': True}), 22: ('wagtail.blocks.StreamBlock', [[('heading', 7), ('paragraph', 8), ('definition_list', 19)]], {'help_text': 'Content for the text column', 'required': True}), 23: ('wagtail.blocks.StructBlock', [[('image_position', 20), ('image', 21), ('content', 22)]], {}), 24: ('wagtail.blocks.StreamBlock', [[('heading', 7), ('paragraph', 8), ('features', 14), ('definition_list', 19), ('two_column', 23)]], {'required': False}), 25: ('wagtail.blocks.StructBlock', [[('title', 5), ('background', 6), ('content', 24)]], {})}),
+        ),
+    ]
@@ -1,8 +1,24 @@
-from wagtail.models import Page
+from django.conf import settings
+from django.db import models
+from django.utils.cache import get_conditional_response
+from wagtail.models import Page, PageViewRestriction, Revision
 from wagtail.fields import StreamField
 from wagtail.admin.panels import FieldPanel
 
 from .blocks import HeroBlock, SectionBlock
+from .cache import (
+    cache_content,
+    cache_response,
+    get_cached_response,
+    get_page_validators,
+    is_cacheable_request,
+    remember_cache_key,
+    set_validator_headers,
+)
+from .images import prefetch_images
+from .materialize import get_rendered_body, render_body, store_body
+from .streaming import add_preload_links, stream_page
+from .timing import add_block_timings, record_block_timings
 
 
 class HomePage(Page):
@@ -18,3 +34,140 @@ class HomePage(Page):
     content_panels = Page.content_panels + [
         FieldPanel("body"),
     ]
+
+    def serve(self, request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            response, timings = self.render_response(request, *args, **kwargs)
+            return add_preload_links(add_block_timings(response, timings))
+
+        request.is_preview = False
+        etag, last_modified = get_page_validators(self)
+
+        # Answer revalidation with a 304 before looking at the cache or rendering
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = get_cached_response(self, request)
+        if response is None and self.has_view_restrictions():
+            # Only visitors the restriction let through get here. Keep the page
+            # out of the caches every visitor is served from, the ASGI fast
+            # path included. Publishing or restricting a page drops its entries.
+            response, timings = self.render_response(request, *args, **kwargs)
+            add_block_timings(response, timings)
+            return add_preload_links(set_validator_headers(response, etag, last_modified))
+        if response is None and getattr(settings, "PAGE_STREAMING", False):
+            response = stream_page(
+                self,
+                request,
+                body=get_rendered_body(self),
+                on_body=lambda body: store_body(self, body),
+                on_complete=lambda content: cache_content(
+                    self, request, "text/html; charset=utf-8", content.encode()
+                ),
+            )
+        if response is None:
+            response, timings = self.render_response(request, *args, **kwargs)
+            cache_response(self, request, response)
+            add_block_timings(response, timings)
+
+        if response.status_code == 200:
+            remember_cache_key(self, request)
+
+        return add_preload_links(set_validator_headers(response, etag, last_modified))
+
+    def has_view_restrictions(self):
+        """
+        Whether ``get_view_restrictions()`` finds any, in one query rather than
+        another two after Wagtail's check of them.
+        """
+        if self.alias_of_id is not None:
+            return self.get_view_restrictions().exists()
+
+        paths = [self.path[:end] for end in range(self.steplen, len(self.path) + 1, self.steplen)]
+        return PageViewRestriction.objects.filter(page__path__in=paths).exists()
+
+    def get_context(self, request, *args, rendered_body=None, **kwargs):
+        context = super().get_context(request, *args, **kwargs)
+        context["rendered_body"] = rendered_body
+        return context
+
+    def render_response(self, request, *args, **kwargs):
+        """
+        Render the page around the stored body of its live revision, returning
+        the response and the block timings of the render.
+
+        Without a stored body the blocks are rendered with their images
+        prefetched, and the body is stored for the next render.
+        """
+        body = get_rendered_body(self)
+        timings = None
+        if body is None:
+            context = self.get_context(request, *args, **kwargs)
+            with prefetch_images(self.body), record_block_timings() as timings:
+                body = render_body(self, context)
+            store_body(self, body)
+
+        response = super().serve(request, *args, rendered_body=body, **kwargs).render()
+        return response, timings
+
+    def serve_preview(self, request, mode_name):
+        with prefetch_images(self.body), record_block_timings() as timings:
+            response = super().serve_preview(request, mode_name).render()
+        return add_block_timings(response, timings)
+
+
+class RenderedBody(models.Model):
+    """
+    The body HTML of the live revision of a page, with the fingerprint of
+    the templates it was rendered with, see ``home.materialize``.
+    """
+
+    page = models.OneToOneField(
+        HomePage, on_delete=models.CASCADE, related_name="rendered_body"
+    )
+    revision = models.ForeignKey(Revision, on_delete=models.CASCADE, related_name="+")
+    fingerprint = models.CharField(max_length=64)
+    html = models.TextField()
+    rendered_at = models.DateTimeField(auto_now=True)
+
+
+class Job(models.Model):
+    """
+    A call of a function registered with ``home.tasks.task``, waiting for or
+    taken by a ``run_tasks`` worker. Finished jobs are deleted, failed ones
+    are kept with their last error.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    ]
+
+    task = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    # Jobs with the same key do the same work, one of them is pending at most
+    key = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField()
+    # Running jobs are taken over by another worker after this, as their
+    # worker is gone
+    locked_until = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(status="pending"),
+                name="home_job_unique_pending_key",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.task}{tuple(self.args)}"
@@ -0,0 +1,70 @@
+"""Rich text expanded once per source, until a linked page or document changes."""
+
+import hashlib
+
+from django.conf import settings
+from wagtail import blocks
+from wagtail.rich_text import RichText, extract_references_from_rich_text
+
+from .cache import get_block_cache, get_deploy_version, get_reference_versions
+
+RICH_TEXT_KEY_PREFIX = "home:richtext"
+
+
+def get_rich_text_cache_key(source, versions=()):
+    # Rendered again after a deploy, with the link handlers and templates it brings
+    data = ":".join([get_deploy_version()[0], source, *versions])
+    return f"{RICH_TEXT_KEY_PREFIX}:{hashlib.sha256(data.encode()).hexdigest()}"
+
+
+def get_references(source):
+    """``(model label, pk)`` of the pages and documents linked from rich text."""
+    if "linktype" not in source and "embedtype" not in source:
+        return set()
+
+    return {
+        (model._meta.label_lower, str(pk))
+        for model, pk, *_ in extract_references_from_rich_text(source)
+    }
+
+
+def block_references(block, value):
+    """References of all rich text in a block value, nested blocks included."""
+    from .blocks import walk_blocks
+
+    references = set()
+    for child_block, child_value in walk_blocks(block, value):
+        if isinstance(child_value, RichText):
+            references |= get_references(child_value.source)
+    return references
+
+
+class MemoizedRichText(RichText):
+    """
+    Rich text whose expanded HTML is kept in the block cache by a hash of the
+    source, so links and embeds are only rewritten, and their pages and
+    documents only queried, once. The key includes the versions of the linked
+    pages and documents, which change with them, see ``home.signals``.
+    """
+
+    def __html__(self):
+        cache = get_block_cache()
+        versions = get_reference_versions(get_references(self.source))
+        key = get_rich_text_cache_key(self.source, versions)
+
+        html = cache.get(key)
+        if html is None:
+            html = super().__html__()
+            cache.set(key, html, getattr(settings, "BLOCK_CACHE_TIMEOUT", None))
+
+        return html
+
+
+class MemoizedRichTextBlock(blocks.RichTextBlock):
+    """``RichTextBlock`` with ``MemoizedRichText`` values."""
+
+    def to_python(self, value):
+        return MemoizedRichText(super().to_python(value).source)
+
+    def normalize(self, value):
+        return MemoizedRichText(super().normalize(value).source)
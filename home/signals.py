@@ -0,0 +1,154 @@
+"""Signal handlers keeping derived page data in sync, and tuning database connections."""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.documents import get_document_model
+from wagtail.images import get_image_model
+from wagtail.models import Page, PageViewRestriction, Site
+from wagtail.signals import page_published, page_slug_changed, page_unpublished, post_page_move
+
+from resolve.redirects import bump_redirect_version
+from resolve.routing import bump_routing_version
+
+from .cache import invalidate_page, invalidate_references
+from .images import generate_page_renditions
+from .materialize import discard_bodies, enqueue_materialize
+from .models import HomePage
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def invalidate_page_cache(sender, instance, **kwargs):
+    invalidate_page(instance.pk)
+
+
+@receiver(post_save, sender=PageViewRestriction)
+@receiver(post_delete, sender=PageViewRestriction)
+def invalidate_restricted_pages(sender, instance, **kwargs):
+    """
+    Restrictions apply to the page and every page below it. Cached responses
+    are served without checking them, drop those of all of these pages.
+    """
+    # Gone already when the restriction is deleted along with its page
+    page = Page.objects.filter(pk=instance.page_id).first()
+    if page is None:
+        return
+
+    for pk in Page.objects.descendant_of(page, inclusive=True).values_list("pk", flat=True):
+        invalidate_page(pk)
+
+
+@receiver(page_published)
+def queue_page_renditions(sender, instance, **kwargs):
+    """Generate image renditions after publishing instead of on the first visit."""
+    generate_page_renditions.enqueue(instance.pk, key=f"renditions:{instance.pk}")
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def invalidate_page_links(sender, instance, **kwargs):
+    """Drop rich text, fragments and pages linking to the page."""
+    invalidate_links("wagtailcore.page", str(instance.pk))
+
+
+@receiver(page_slug_changed)
+@receiver(post_page_move)
+def invalidate_subtree_links(sender, instance, **kwargs):
+    """
+    The URLs of the page and all pages below it changed. Their cached
+    responses go as well, or the old URLs keep serving them from the ASGI
+    fast path instead of reaching the redirects Wagtail creates.
+    """
+    for pk in Page.objects.descendant_of(instance, inclusive=True).values_list("pk", flat=True):
+        invalidate_page(pk)
+        invalidate_links("wagtailcore.page", str(pk))
+
+
+@receiver(post_delete)
+def invalidate_deleted_page_links(sender, instance, **kwargs):
+    if isinstance(instance, Page):
+        invalidate_links("wagtailcore.page", str(instance.pk))
+
+
+@receiver(post_save, sender=get_document_model())
+@receiver(post_delete, sender=get_document_model())
+def invalidate_document_links(sender, instance, **kwargs):
+    """Drop rich text, fragments and pages linking to the document."""
+    invalidate_links(instance._meta.label_lower, str(instance.pk))
+
+
+@receiver(post_save, sender=get_image_model())
+@receiver(post_delete, sender=get_image_model())
+def invalidate_image_links(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop the pages showing the image, a replaced file deletes the renditions
+    their stored bodies point to.
+    """
+    # Sizes and hashes filled in while renditions are generated change no URLs
+    if update_fields and set(update_fields) <= {"file_size", "file_hash"}:
+        return
+    invalidate_links(instance._meta.label_lower, str(instance.pk))
+
+
+def invalidate_links(label, pk):
+    """
+    Drop everything rendered with links to an object, and queue rendering
+    the dropped bodies again.
+    """
+    page_ids = invalidate_references(label, pk)
+    discard_bodies(page_ids)
+    enqueue_materialize(page_ids)
+
+
+@receiver(page_published, sender=HomePage)
+def queue_materialize_body(sender, instance, **kwargs):
+    """Render the body of the published revision once, for every later render."""
+    enqueue_materialize([instance.pk])
+
+
+@receiver(post_save, sender=Redirect)
+@receiver(post_delete, sender=Redirect)
+def reload_redirects(sender, instance, **kwargs):
+    """
+    Every process reloads its redirect table on its next 404. Again after
+    the commit, for processes that reloaded it before the change was visible.
+    """
+    bump_redirect_version()
+    transaction.on_commit(bump_redirect_version)
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(page_slug_changed)
+@receiver(post_page_move)
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def reload_routing(sender, **kwargs):
+    """Every process reloads its routing table on its next request."""
+    bump_routing_version()
+    transaction.on_commit(bump_routing_version)
+
+
+@receiver(post_delete)
+def reload_routing_for_deleted_page(sender, instance, **kwargs):
+    if isinstance(instance, Page):
+        reload_routing(sender)
+
+
+def sqlite_pragmas(pragmas):
+    return [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply ``SQLITE_PRAGMAS`` to each new SQLite connection."""
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        for statement in sqlite_pragmas(getattr(settings, "SQLITE_PRAGMAS", {})):
+            cursor.execute(statement)
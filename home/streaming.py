@@ -0,0 +1,101 @@
+"""Streamed page responses that send the document head before the body renders."""
+
+import contextvars
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+
+from .fonts import get_self_hosted_fonts
+from .images import prefetch_images
+from .timing import record_block_timings, timing_comment
+
+# Rendered by home_page.html instead of the body blocks when streaming
+BODY_PLACEHOLDER = "<!-- streamed body -->"
+
+
+def get_preload_links():
+    """
+    ``Link`` header preloading the stylesheet and fonts. Proxies such as nginx
+    or Cloudflare turn this into a ``103 Early Hints`` response.
+    """
+    links = [f"<{static('styles.css')}>; rel=preload; as=style"]
+    for font in get_self_hosted_fonts():
+        if font["preload"]:
+            links.append(f'<{font["url"]}>; rel=preload; as=font; type="font/woff2"; crossorigin')
+
+    return ", ".join(links)
+
+
+def add_preload_links(response):
+    response.headers["Link"] = get_preload_links()
+    return response
+
+
+async def aiterate(iterator):
+    """
+    Iterate ``iterator`` in the thread of the request, a chunk at a time.
+    Under ASGI Django reads a sync iterator into a list before sending any of
+    it, this sends each chunk as soon as it is rendered.
+    """
+    # One context for every step, the iterator sets and resets context
+    # variables across chunks, e.g. the prefetched images
+    context = contextvars.copy_context()
+    get_next = sync_to_async(context.run, thread_sensitive=True)
+    done = object()
+    while (chunk := await get_next(next, iterator, done)) is not done:
+        yield chunk
+
+
+def stream_page(page, request, body=None, on_body=None, on_complete=None):
+    """
+    Return a ``StreamingHttpResponse`` for ``page`` that flushes everything up
+    to the body straight away, then each top-level body block as it renders.
+    A stored ``body`` is sent in one chunk instead.
+
+    ``on_body`` is called with the body HTML once the blocks have rendered,
+    e.g. to store it for later renders, and ``on_complete`` with the full
+    document once the last chunk has been sent, e.g. to store it in the page
+    cache.
+    """
+    context = page.get_context(request)
+    context["stream_body"] = True
+    shell = render_to_string(page.get_template(request), context, request=request)
+    head, tail = shell.split(BODY_PLACEHOLDER, 1)
+
+    def chunks():
+        parts = [head]
+        yield head
+
+        timings = None
+        if body is not None:
+            parts.append(body)
+            yield body
+        else:
+            with prefetch_images(page.body), record_block_timings() as timings:
+                blocks = []
+                for block in page.body:
+                    html = str(block.render(context=context))
+                    blocks.append(html)
+                    yield html
+            parts.extend(blocks)
+            if on_body is not None:
+                on_body("".join(blocks))
+
+        parts.append(tail)
+        yield tail
+
+        if on_complete is not None:
+            on_complete("".join(parts))
+
+        # Headers are long gone, so timings can only be reported in the body
+        if timings is not None and getattr(settings, "BLOCK_TIMING_COMMENT", False):
+            yield timing_comment(timings)
+
+    content = chunks()
+    if isinstance(request, ASGIRequest):
+        content = aiterate(content)
+    return StreamingHttpResponse(content, content_type="text/html; charset=utf-8")
@@ -0,0 +1,245 @@
+"""Deterministic synthetic StreamField content for benchmarks and load tests."""
+
+import functools
+import io
+import random
+import uuid
+
+WORDS = (
+    "automate workflow language model ethical small business document process "
+    "review summary customer support privacy local insight report draft team "
+    "knowledge search archive invoice contract policy research open source"
+).split()
+
+
+# Text is picked from pools built once per length, composing it word by word
+# dominates the time it takes to generate thousands of pages
+POOL_SIZE = 512
+
+
+@functools.cache
+def sentence_pool(words):
+    rng = random.Random(words)
+    pool = []
+    for _ in range(POOL_SIZE):
+        text = " ".join(rng.choices(WORDS, k=words))
+        pool.append(text[0].upper() + text[1:] + ".")
+    return pool
+
+
+@functools.cache
+def paragraph_pool(sentences):
+    rng = random.Random(sentences)
+    pool = []
+    for _ in range(POOL_SIZE):
+        parts = rng.sample(sentence_pool(12), sentences)
+        parts[0] = f"<b>{parts[0]}</b>"
+        if sentences > 1:
+            parts[-1] = f"<i>{parts[-1]}</i>"
+        pool.append(f"<p>{' '.join(parts)}</p>")
+    return pool
+
+
+def sentence(rng, words=12):
+    return rng.choice(sentence_pool(words))
+
+
+def paragraph(rng, sentences=3):
+    """Rich text paragraph with some inline formatting."""
+    return rng.choice(paragraph_pool(sentences))
+
+
+def heading(rng):
+    return f"<h4>{sentence(rng, words=4)}</h4>"
+
+
+@functools.cache
+def definition_pool():
+    rng = random.Random("definitions")
+    return [
+        {"term": sentence(rng, words=2), "definition": paragraph(rng, sentences=1)}
+        for _ in range(POOL_SIZE)
+    ]
+
+
+@functools.cache
+def feature_pool():
+    rng = random.Random("features")
+    return [
+        {"heading": sentence(rng, words=3), "description": paragraph(rng, sentences=2)}
+        for _ in range(POOL_SIZE)
+    ]
+
+
+def definition_list(rng, items=4):
+    return {"items": rng.choices(definition_pool(), k=items)}
+
+
+def features(rng, items):
+    return {
+        "columns": rng.choice(["3", "4"]),
+        "features": rng.choices(feature_pool(), k=items),
+    }
+
+
+def two_column(rng, image_ids):
+    return {
+        "image_position": rng.choice(["left", "right"]),
+        "image": rng.choice(image_ids),
+        "content": [
+            {"type": "heading", "value": heading(rng)},
+            {"type": "paragraph", "value": paragraph(rng)},
+            {"type": "definition_list", "value": definition_list(rng, items=3)},
+        ],
+    }
+
+
+def section(rng, image_ids):
+    """Section containing every kind of content block, images only if available."""
+    content = [
+        {"type": "heading", "value": heading(rng)},
+        {"type": "paragraph", "value": paragraph(rng)},
+        {"type": "features", "value": features(rng, items=rng.randint(3, 24))},
+        {"type": "definition_list", "value": definition_list(rng)},
+    ]
+    if image_ids:
+        content.append({"type": "two_column", "value": two_column(rng, image_ids)})
+
+    return {
+        "title": sentence(rng, words=3),
+        "background": rng.choice(["light", "dark"]),
+        "content": content,
+    }
+
+
+def hero(rng):
+    return {
+        "heading": sentence(rng, words=3),
+        "body_text": sentence(rng, words=20),
+        "cta_email": "hello@example.com",
+        "cta_phone": "+31 20 123 4567",
+    }
+
+
+def block_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_body(size, image_ids=(), seed=0):
+    """
+    Raw ``HomePage.body`` data with ``size`` top-level blocks: a hero followed
+    by sections, each nesting features, definition lists and two column blocks.
+    """
+    rng = random.Random(seed)
+    body = [{"type": "hero", "value": hero(rng), "id": block_id(rng)}]
+    body.extend(
+        {"type": "section", "value": section(rng, list(image_ids)), "id": block_id(rng)}
+        for _ in range(size - 1)
+    )
+    return body[:size]
+
+
+def generate_image_file(name, seed=0, size=(1200, 800)):
+    """A PNG ``ImageFile`` filled with a colour picked by ``seed``."""
+    from django.core.files.images import ImageFile
+    from PIL import Image as PILImage
+
+    rng = random.Random(seed)
+    colour = tuple(rng.randrange(256) for _ in range(3))
+    f = io.BytesIO()
+    PILImage.new("RGB", size, colour).save(f, "PNG")
+    return ImageFile(f, name=name)
+
+
+def bulk_add_children(parent, pages, published_at=None):
+    """
+    Insert unsaved ``pages`` of a single page type as live children of
+    ``parent``, each with a revision, using a few bulk queries per batch
+    instead of ``add_child`` and ``publish`` per page.
+
+    No signals are sent, so the search and reference indexes are not updated.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from django.db import connection, transaction
+    from django.db.models import CharField, F, OuterRef, Subquery
+    from django.db.models.functions import Cast
+    from django.utils import timezone
+    from modelcluster.models import (
+        get_all_child_m2m_relations,
+        get_all_child_relations,
+        get_serializable_data_for_fields,
+    )
+    from treebeard.exceptions import PathOverflow
+    from wagtail.models import Page, Revision
+
+    if not pages:
+        return pages
+
+    model = type(pages[0])
+    content_type = ContentType.objects.get_for_model(model)
+    published_at = published_at or timezone.now()
+
+    with transaction.atomic():
+        parent = Page.objects.select_for_update().get(pk=parent.pk)
+        last_child = parent.get_last_child()
+        step = Page._str2int(last_child.path[-Page.steplen :]) if last_child else 0
+        if step + len(pages) >= len(Page.alphabet) ** Page.steplen:
+            raise PathOverflow(f"Too many children for {parent.path}")
+
+        for i, page in enumerate(pages, start=step + 1):
+            page.path = Page._get_path(parent.path, parent.depth + 1, i)
+            page.depth = parent.depth + 1
+            page.numchild = 0
+            page.url_path = f"{parent.url_path}{page.slug}/"
+            page.content_type = content_type
+            page.locale_id = parent.locale_id
+            page.draft_title = page.title
+            page.live = True
+            page.has_unpublished_changes = False
+            page.first_published_at = page.last_published_at = published_at
+            page.latest_revision_created_at = published_at
+
+        # Rows in the wagtailcore_page table, then in the page type's own table
+        Page.objects.bulk_create(pages)
+        for page in pages:
+            page.page_ptr_id = page.id
+
+        fields = model._meta.local_concrete_fields
+        batch_size = connection.ops.bulk_batch_size(fields, pages)
+        for start in range(0, len(pages), batch_size):
+            model._base_manager._insert(pages[start : start + batch_size], fields=fields)
+
+        # Same as serializable_data(), without a query per child relation:
+        # new pages do not have any related objects yet
+        empty_relations = {
+            rel.get_accessor_name(): [] for rel in get_all_child_relations(model)
+        }
+        empty_relations.update(
+            {f.name: [] for f in get_all_child_m2m_relations(model) if f.serialize}
+        )
+        base_content_type = pages[0].get_base_content_type()
+        Revision.objects.bulk_create(
+            Revision(
+                content_type=content_type,
+                base_content_type=base_content_type,
+                object_id=str(page.pk),
+                created_at=published_at,
+                object_str=page.title,
+                content={**get_serializable_data_for_fields(page), **empty_relations},
+            )
+            for page in pages
+        )
+
+        # Point the pages at their revisions in one statement, bulk_update
+        # would build a CASE expression with a branch per page
+        revision = Revision.objects.filter(
+            base_content_type=base_content_type,
+            object_id=Cast(OuterRef("pk"), CharField()),
+        ).values("pk")[:1]
+        Page.objects.filter(pk__in=[page.pk for page in pages]).update(
+            latest_revision=Subquery(revision), live_revision=Subquery(revision)
+        )
+
+        Page.objects.filter(pk=parent.pk).update(numchild=F("numchild") + len(pages))
+
+    return pages
@@ -0,0 +1,188 @@
+"""Database backed job queue for work that can run after the request, see the run_tasks command."""
+
+import logging
+import os
+import traceback
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Registered tasks by name
+TASKS = {}
+
+# Seconds a worker holds a job before another worker may take it over
+LOCK_TIMEOUT = 600
+
+
+@dataclass(frozen=True)
+class Task:
+    """
+    A function workers run for queued jobs, with at most ``concurrency``
+    jobs of it running at once in all workers, ``None`` for no limit. Failed
+    jobs are retried after ``retry_delay`` seconds, doubling for each
+    attempt, until ``max_attempts``.
+    """
+
+    func: object
+    name: str
+    concurrency: int | None = None
+    max_attempts: int = 3
+    retry_delay: int = 30
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def enqueue(self, *args, key=None, delay=0):
+        return enqueue(self, *args, key=key, delay=delay)
+
+
+def task(concurrency=None, max_attempts=3, retry_delay=30):
+    """Register a function whose calls can be queued with ``.enqueue(*args)``."""
+
+    def register(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        TASKS[name] = Task(func, name, concurrency, max_attempts, retry_delay)
+        return TASKS[name]
+
+    return register
+
+
+def enqueue(task, *args, key=None, delay=0):
+    """
+    Queue a call of ``task`` with JSON serializable ``args``, to run after
+    ``delay`` seconds. Returns the job.
+
+    When a job with the same ``key`` is pending already that job is returned
+    instead, it will do the same work. A job with the key that is running
+    already may have read the data before it changed, so one is queued.
+
+    The job is saved in the current transaction, workers only see it once the
+    transaction is committed.
+    """
+    from .models import Job
+
+    job = Job(
+        task=task.name,
+        args=list(args),
+        key=key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if key is None:
+        job.save()
+        return job
+
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        pending = Job.objects.filter(key=key, status=Job.PENDING).first()
+        if pending is None:
+            # Taken by a worker in the meantime
+            return enqueue(task, *args, key=key, delay=delay)
+        return pending
+    return job
+
+
+def claim():
+    """
+    Take the next due job whose task is below its concurrency limit, or a
+    running job whose worker is gone, and mark it running. Returns the job
+    or ``None``.
+
+    The limits count the jobs running in all workers. They hold as long as
+    claims do not overlap, as with SQLite, where they take the write lock.
+    """
+    from .models import Job
+
+    now = timezone.now()
+    with transaction.atomic():
+        running = Counter(
+            Job.objects.filter(status=Job.RUNNING, locked_until__gt=now).values_list(
+                "task", flat=True
+            )
+        )
+        full = [
+            name
+            for name, count in running.items()
+            if name in TASKS
+            and TASKS[name].concurrency is not None
+            and count >= TASKS[name].concurrency
+        ]
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.PENDING) | Q(status=Job.RUNNING, locked_until__lte=now),
+                run_at__lte=now,
+            )
+            .exclude(task__in=full)
+            .order_by("run_at", "pk")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.locked_until = now + timedelta(seconds=LOCK_TIMEOUT)
+        job.save(update_fields=["status", "attempts", "locked_until"])
+    return job
+
+
+def run(job):
+    """Run a claimed job, then delete it, queue a retry or mark it failed."""
+    from .models import Job
+
+    task = TASKS.get(job.task)
+    try:
+        if task is None:
+            raise LookupError(f"No task named {job.task!r} is registered")
+        task(*job.args)
+    except Exception:
+        job.error = traceback.format_exc()
+        logger.exception("Job %s failed, attempt %d", job, job.attempts)
+    else:
+        job.delete()
+        return True
+
+    if task is not None and job.attempts < task.max_attempts:
+        job.status = Job.PENDING
+        job.run_at = timezone.now() + timedelta(
+            seconds=task.retry_delay * 2 ** (job.attempts - 1)
+        )
+    else:
+        job.status = Job.FAILED
+    job.locked_until = None
+
+    try:
+        with transaction.atomic():
+            job.save(update_fields=["status", "run_at", "locked_until", "error"])
+    except IntegrityError:
+        # A job with the same key was queued while this one ran, it retries
+        job.delete()
+    return False
+
+
+def run_pending():
+    """Run jobs until none are due, returns the number of jobs run."""
+    count = 0
+    while (job := claim()) is not None:
+        run(job)
+        count += 1
+    return count
+
+
+def work(stop, poll_interval=1.0):
+    """
+    Run jobs as they become due, until the ``stop`` event is set. The loop
+    of each ``run_tasks`` worker process.
+    """
+    logger.info("Worker %d started", os.getpid())
+    while not stop.is_set():
+        if run_pending() == 0:
+            stop.wait(poll_interval)
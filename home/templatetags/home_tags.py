@@ -0,0 +1,24 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from home.critical_css import load_critical_css
+from home.fonts import get_self_hosted_fonts
+
+register = template.Library()
+
+
+@register.simple_tag
+def self_hosted_fonts():
+    """Fonts generated by the subset_fonts command, see ``home.fonts``."""
+    return get_self_hosted_fonts()
+
+
+@register.simple_tag(takes_context=True)
+def critical_css(context):
+    """Critical CSS for the current page's template, see ``home.critical_css``."""
+    page = context.get("page")
+    request = context.get("request")
+    if page is None or request is None:
+        return ""
+
+    return mark_safe(load_critical_css().get(page.get_template(request), ""))
@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def wagtailuserbar(position=""):
+    """
+    Stand-in for Wagtail's user bar on public workers, which do not install the
+    admin. The user bar is only shown to editors, who use the admin workers.
+    """
+    return ""
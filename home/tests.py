@@ -1,9 +1,86 @@
+import asyncio
+import gzip
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from contextlib import nullcontext
+from io import StringIO
+from unittest import mock
+
+import brotli
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
-from home.models import HomePage
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont
+from home.asgi import CachedPageApplication
+from home.blocks import SectionBlock, TwoColumnBlock
+from home.cache import (
+    acache_url_response,
+    aget_url_response,
+    fragment_cache_stats,
+    fragment_stats,
+    get_block_cache,
+    get_cache_key,
+    get_page_cache,
+    get_page_version,
+    invalidate_page,
+)
+from home.critical_css import extract_critical_css, load_critical_css
+from home.fonts import get_self_hosted_fonts
+from home.frontend_cache import PageCacheBackend
+from home.images import generate_image_renditions
+from home.management.commands.run_tasks import run_worker
+from home.materialize import render_body
+from home.models import HomePage, Job, RenderedBody
+from home.rich_text import MemoizedRichTextBlock
+from home.tasks import claim, run, run_pending, task
+from home.timing import BlockTimings
+from resolve.cache import ProcessTable, Store, TieredCache
+from resolve.middleware import QueryRecorder
+from resolve.redirects import get_redirect_table
+from resolve.routing import RoutingTable, get_routing_table
 
-from wagtail.models import Page
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.documents.models import Document
+from wagtail.images.models import Image
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Page, PageViewRestriction, Site
 from wagtail.test.utils import WagtailPageTestCase
 
+# Tests run against an in-process cache, so they neither clear the file based
+# cache of the project nor read entries left behind by earlier runs
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tests",
+    },
+}
+test_caches = override_settings(CACHES=TEST_CACHES)
+
+
+def setUpModule():
+    test_caches.enable()
+
+
+def tearDownModule():
+    test_caches.disable()
+
 
 class HomeSetUpTests(WagtailPageTestCase):
     """
@@ -41,3 +118,1817 @@ class HomeTests(WagtailPageTestCase):
     def test_homepage_template_used(self):
         response = self.client.get(reverse("home"))
         self.assertTemplateUsed(response, "home/home_page.html")
+
+
+class PageCacheTests(WagtailPageTestCase):
+    """
+    Tests for the rendered page response cache.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.body = [
+            {"type": "hero", "value": {"heading": "Hello", "body_text": "World"}},
+            {
+                "type": "section",
+                "value": {
+                    "title": "Section",
+                    "content": [{"type": "paragraph", "value": "<p>Text</p>"}],
+                },
+            },
+        ]
+        self.homepage.save_revision().publish()
+        self.homepage.refresh_from_db()
+
+    def test_second_anonymous_get_is_served_from_cache(self):
+        first = self.client.get("/")
+        self.assertTemplateUsed(first, "home/home_page.html")
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get("/")
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.templates, [])
+        self.assertEqual(second.content, first.content)
+        content_tables = ("wagtailcore_revision", "wagtailimages_")
+        self.assertFalse(
+            [q["sql"] for q in queries if any(t in q["sql"] for t in content_tables)]
+        )
+
+    def test_publish_invalidates_cache(self):
+        self.client.get("/")
+
+        self.homepage.body = [
+            {"type": "hero", "value": {"heading": "Updated", "body_text": "World"}},
+        ]
+        self.homepage.save_revision().publish()
+
+        response = self.client.get("/")
+        self.assertTemplateUsed(response, "home/home_page.html")
+        self.assertContains(response, "Updated")
+
+    def test_unpublish_invalidates_cache(self):
+        response = self.client.get("/")
+        key = get_cache_key(self.homepage, response.wsgi_request)
+        self.assertIsNotNone(get_page_cache().get(key))
+
+        self.homepage.unpublish()
+        # Left to expire, it is no longer looked up under the new page version
+        self.assertNotEqual(get_cache_key(self.homepage, response.wsgi_request), key)
+
+    def test_logged_in_requests_share_cache(self):
+        anonymous = self.client.get("/")
+        self.login()
+
+        response = self.client.get("/")
+        self.assertEqual(response.templates, [])
+        self.assertEqual(response.content, anonymous.content)
+
+
+class BlockFragmentCacheTests(WagtailPageTestCase):
+    """
+    Tests for the per-block fragment cache.
+    """
+
+    def setUp(self):
+        get_block_cache().clear()
+        fragment_stats.clear()
+        self.block = SectionBlock()
+
+    def section(self, definition):
+        return self.block.to_python(
+            {
+                "title": "Section",
+                "background": "light",
+                "content": [
+                    {
+                        "type": "features",
+                        "value": {
+                            "columns": "3",
+                            "features": [
+                                {"heading": "Feature", "description": "<p>Text</p>"},
+                            ],
+                        },
+                    },
+                    {
+                        "type": "definition_list",
+                        "value": {"items": [{"term": "Term", "definition": definition}]},
+                    },
+                ],
+            }
+        )
+
+    def test_identical_content_is_rendered_once(self):
+        first = self.block.render(self.section("<p>One</p>"))
+        second = self.block.render(self.section("<p>One</p>"))
+
+        self.assertEqual(first, second)
+        stats = fragment_cache_stats()
+        self.assertEqual(stats["SectionBlock"], {"hit": 1, "miss": 1, "ratio": 0.5})
+        self.assertEqual(stats["FeaturesBlock"], {"hit": 0, "miss": 1, "ratio": 0.0})
+
+    def test_edit_only_rerenders_changed_block(self):
+        self.block.render(self.section("<p>One</p>"))
+        fragment_stats.clear()
+
+        html = self.block.render(self.section("<p>Two</p>"))
+
+        self.assertIn("Two", html)
+        stats = fragment_cache_stats()
+        self.assertEqual(stats["SectionBlock"]["miss"], 1)
+        self.assertEqual(stats["DefinitionListBlock"]["miss"], 1)
+        self.assertEqual(stats["FeaturesBlock"], {"hit": 1, "miss": 0, "ratio": 1.0})
+
+    def test_deploy_renders_fragments_again(self):
+        self.block.render(self.section("<p>One</p>"))
+        fragment_stats.clear()
+
+        with (
+            mock.patch("home.blocks.get_deploy_version", return_value=("deployed", 0.0)),
+            mock.patch("home.rich_text.get_deploy_version", return_value=("deployed", 0.0)),
+        ):
+            self.block.render(self.section("<p>One</p>"))
+
+        stats = fragment_cache_stats()
+        self.assertEqual(stats["SectionBlock"], {"hit": 0, "miss": 1, "ratio": 0.0})
+        self.assertEqual(stats["FeaturesBlock"], {"hit": 0, "miss": 1, "ratio": 0.0})
+        # Rich text is expanded again too, once per deploy
+        rich_text_keys = [key for key in get_block_cache()._cache if ":home:richtext:" in key]
+        self.assertEqual(len(rich_text_keys), 4)
+
+
+class ExportStaticTests(WagtailPageTestCase):
+    """
+    Tests for the incremental static site export.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.body = [
+            {"type": "hero", "value": {"heading": "Exported", "body_text": "World"}},
+        ]
+        self.homepage.save_revision().publish()
+
+    def export(self):
+        stdout = StringIO()
+        call_command(
+            "export_static",
+            output=self.output,
+            workers=1,
+            skip_assets=True,
+            stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def test_export_renders_live_pages(self):
+        self.assertIn("(1 rendered)", self.export())
+
+        with open(os.path.join(self.output, "index.html")) as f:
+            self.assertIn("Exported", f.read())
+        self.assertTrue(os.path.exists(os.path.join(self.output, "sitemap.xml")))
+
+    def test_export_only_rerenders_changed_pages(self):
+        self.export()
+        self.assertIn("(0 rendered)", self.export())
+
+        self.homepage.refresh_from_db()
+        self.homepage.save_revision().publish()
+        self.assertIn("(1 rendered)", self.export())
+
+
+class ImagePageMixin:
+    """
+    Gives the homepage an unpublished TwoColumnBlock body whose image is stored
+    in a temporary media root.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.image = Image.objects.create(title="Profile", file=get_test_image_file())
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.body = [
+            {
+                "type": "section",
+                "value": {
+                    "title": "About",
+                    "content": [
+                        {
+                            "type": "two_column",
+                            "value": {
+                                "image": self.image.pk,
+                                "content": [{"type": "heading", "value": "<h4>Hi</h4>"}],
+                            },
+                        }
+                    ],
+                },
+            },
+        ]
+
+
+class ResponsiveImageTests(ImagePageMixin, WagtailPageTestCase):
+    """
+    Tests for the TwoColumnBlock <picture> renditions.
+    """
+
+    def test_replacing_the_image_drops_stored_bodies(self):
+        # The reference index is updated once the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.homepage.save_revision().publish()
+        run_pending()
+        old_file = self.image.file.name.rpartition("/")[2].rpartition(".")[0]
+        self.assertContains(self.client.get("/"), old_file)
+
+        self.image.file = get_test_image_file(filename="replaced.png")
+        self.image.save()
+        self.image.renditions.all().delete()
+        get_page_cache().clear()
+
+        response = self.client.get("/")
+        self.assertNotContains(response, old_file)
+        self.assertContains(response, "replaced")
+
+    def test_renditions_are_generated_on_publish(self):
+        self.assertFalse(self.image.renditions.exists())
+
+        self.homepage.save_revision().publish()
+        self.assertFalse(self.image.renditions.exists())
+        run_pending()
+
+        filters = TwoColumnBlock().get_rendition_filters()
+        self.assertEqual(
+            set(self.image.renditions.values_list("filter_spec", flat=True)),
+            set(filters),
+        )
+
+    def test_page_renders_picture_without_creating_renditions(self):
+        self.homepage.save_revision().publish()
+        run_pending()
+        renditions = self.image.renditions.count()
+
+        response = self.client.get("/")
+
+        self.assertContains(response, '<source type="image/avif"')
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, 'sizes="(min-width: 768px)')
+        self.assertEqual(self.image.renditions.count(), renditions)
+
+
+class WarmRenditionsTests(ImagePageMixin, WagtailPageTestCase):
+    """
+    Tests for the warm_renditions management command.
+    """
+
+    def publish(self):
+        self.homepage.save_revision().publish()
+        run_pending()
+
+    def warm(self):
+        stdout = StringIO()
+        call_command("warm_renditions", workers=1, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_generates_missing_renditions(self):
+        self.publish()
+        self.image.renditions.all().delete()
+
+        self.assertIn("12 missing renditions", self.warm())
+        self.assertEqual(self.image.renditions.count(), 12)
+
+    def test_renditions_of_an_image_are_generated_in_one_job(self):
+        self.publish()
+        self.image.renditions.all().delete()
+
+        with mock.patch(
+            "home.management.commands.warm_renditions.generate_image_renditions",
+            wraps=generate_image_renditions,
+        ) as generate:
+            self.warm()
+        generate.assert_called_once()
+        self.assertEqual(len(generate.call_args.args[1]), 12)
+
+    def test_is_safe_to_run_repeatedly(self):
+        self.publish()
+
+        self.assertIn("0 missing renditions", self.warm())
+        self.assertEqual(self.image.renditions.count(), 12)
+
+    def test_regenerates_renditions_with_missing_files(self):
+        self.publish()
+        rendition = self.image.renditions.first()
+        rendition.file.storage.delete(rendition.file.name)
+        cache.clear()
+
+        self.assertIn("1 missing renditions", self.warm())
+        self.assertEqual(self.image.renditions.count(), 12)
+
+
+class ImagePrefetchTests(ImagePageMixin, WagtailPageTestCase):
+    """
+    Tests for bulk loading images and renditions before rendering a body.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Renditions are cached by image id, which earlier tests used as well
+        cache.clear()
+
+    def publish_image_blocks(self, count):
+        images = [self.image] + [
+            Image.objects.create(title=f"Image {i}", file=get_test_image_file())
+            for i in range(1, count)
+        ]
+        self.homepage.body = [
+            {
+                "type": "section",
+                "value": {
+                    "title": f"Section {i}",
+                    "content": [
+                        {
+                            "type": "two_column",
+                            "value": {
+                                "image": image.pk,
+                                "content": [{"type": "heading", "value": "<h4>Hi</h4>"}],
+                            },
+                        }
+                    ],
+                },
+            }
+            for i, image in enumerate(images)
+        ]
+        self.homepage.save_revision().publish()
+        run_pending()
+        self.homepage.refresh_from_db()
+        cache.clear()
+        # Render the blocks rather than the body stored on publish
+        RenderedBody.objects.all().delete()
+
+    def render(self):
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        return self.homepage.serve(request)
+
+    def test_query_count_does_not_grow_with_image_blocks(self):
+        self.publish_image_blocks(5)
+
+        # Site lookup, view restrictions, the missing stored body, images and
+        # their renditions. Storing the body is left out, see RenderedBodyTests.
+        with self.assertNumQueries(5), mock.patch("home.models.store_body"):
+            response = self.render()
+
+        self.assertEqual(response.content.decode().count("<picture>"), 5)
+
+
+class BenchmarkRenderTests(WagtailPageTestCase):
+    """
+    Tests for the benchmark_render management command.
+    """
+
+    def test_writes_results_and_leaves_no_pages_behind(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        output = os.path.join(output_dir, "results.json")
+        pages = Page.objects.count()
+
+        with mock.patch("home.models.render_body", wraps=render_body) as render:
+            call_command(
+                "benchmark_render", sizes=[2, 6], repeat=1, images=1, output=output,
+                stdout=StringIO(),
+            )
+        # The untimed, cold and warm render of each size render the blocks,
+        # rather than serving the body stored by an earlier render
+        self.assertEqual(render.call_count, 6)
+
+        with open(output) as f:
+            results = json.load(f)["results"]
+        self.assertEqual([r["blocks"] for r in results], [2, 6])
+        for result in results:
+            self.assertGreater(result["queries"], 0)
+            self.assertGreater(result["peak_memory_bytes"], 0)
+            self.assertGreater(result["render_seconds"], 0)
+        self.assertGreater(results[1]["html_bytes"], results[0]["html_bytes"])
+        self.assertEqual(Page.objects.count(), pages)
+        self.assertFalse(Image.objects.exists())
+
+
+class GeneratePagesTests(WagtailPageTestCase):
+    """
+    Tests for the generate_pages management command.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Rendered renditions are cached by image id, which later tests reuse
+        self.addCleanup(cache.clear)
+
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+
+    def generate(self, count, **options):
+        call_command(
+            "generate_pages", count, images=1, batch_size=2, stdout=StringIO(), **options
+        )
+        self.homepage.refresh_from_db()
+        return list(self.homepage.get_children().live().specific().order_by("path"))
+
+    def test_generates_valid_live_pages(self):
+        pages = self.generate(3)
+
+        self.assertEqual([p.slug for p in pages], ["synthetic-0", "synthetic-1", "synthetic-2"])
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+        for page in pages:
+            self.assertEqual(page.live_revision.as_object().title, page.title)
+            self.assertEqual(self.client.get(page.url).status_code, 200)
+
+    def test_content_is_deterministic(self):
+        bodies = [list(p.body.raw_data) for p in self.generate(2)]
+        for page in self.homepage.get_children():
+            page.delete()
+        self.homepage.refresh_from_db()
+
+        self.assertEqual([list(p.body.raw_data) for p in self.generate(2)], bodies)
+        self.assertNotEqual(list(self.generate(1, seed=1)[-1].body.raw_data), bodies[0])
+
+
+class ConditionalGetTests(WagtailPageTestCase):
+    """
+    Tests for ETag / Last-Modified revalidation of pages.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.body = [
+            {"type": "hero", "value": {"heading": "Hello", "body_text": "World"}},
+        ]
+        self.homepage.save_revision().publish()
+
+    def test_response_has_validators(self):
+        response = self.client.get("/")
+
+        self.assertTrue(response.headers["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response.headers)
+        self.assertIn("no-cache", response.headers["Cache-Control"])
+
+    def test_matching_etag_returns_304_without_rendering(self):
+        etag = self.client.get("/").headers["ETag"]
+        invalidate_page(self.homepage.pk)
+
+        response = self.client.get("/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+        self.assertEqual(response.headers["ETag"], etag)
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get("/").headers["Last-Modified"]
+
+        response = self.client.get("/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_publish_changes_etag(self):
+        etag = self.client.get("/").headers["ETag"]
+
+        self.homepage.refresh_from_db()
+        self.homepage.save_revision().publish()
+
+        response = self.client.get("/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+
+class CompressedStaticFilesStorageTests(WagtailPageTestCase):
+    """
+    Tests for minifying, fingerprinting and precompressing static files.
+    """
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+
+    def test_collectstatic_writes_minified_hashed_and_compressed_files(self):
+        with self.settings(
+            STATIC_ROOT=self.static_root,
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+            STORAGES={
+                **settings.STORAGES,
+                "staticfiles": {
+                    "BACKEND": "resolve.storage.CompressedManifestStaticFilesStorage"
+                },
+            },
+        ):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            hashed_name = staticfiles_storage.stored_name("styles.css")
+
+        self.assertRegex(hashed_name, r"^styles\.[0-9a-f]{12}\.css$")
+        with open(finders.find("styles.css"), "rb") as f:
+            source = f.read()
+        with open(os.path.join(self.static_root, hashed_name), "rb") as f:
+            minified = f.read()
+        self.assertLess(len(minified), len(source))
+
+        with gzip.open(os.path.join(self.static_root, hashed_name + ".gz")) as f:
+            self.assertEqual(f.read(), minified)
+        with open(os.path.join(self.static_root, hashed_name + ".br"), "rb") as f:
+            self.assertEqual(brotli.decompress(f.read()), minified)
+
+
+class SubsetFontsTests(WagtailPageTestCase):
+    """
+    Tests for subsetting and serving self-hosted fonts.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.fonts_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.fonts_dir)
+        settings_override = self.settings(
+            FONTS_SOURCE_DIR=self.fonts_dir,
+            FONTS_OUTPUT_DIR=self.fonts_dir,
+            FONTS=[{"family": "Test Sans", "file": "test.ttf", "preload": True}],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(get_self_hosted_fonts.cache_clear)
+
+        self.build_font(os.path.join(self.fonts_dir, "test.ttf"), "HeloéЖ")
+        homepage = Site.objects.get(is_default_site=True).root_page.specific
+        homepage.body = [
+            {"type": "hero", "value": {"heading": "Hello", "body_text": "é"}},
+        ]
+        homepage.save_revision().publish()
+
+    def build_font(self, path, characters):
+        names = {ord(c): f"uni{ord(c):04X}" for c in characters}
+        glyph_order = [".notdef", *names.values()]
+
+        glyphs = {}
+        for name in glyph_order:
+            pen = TTGlyphPen(None)
+            pen.moveTo((0, 0))
+            pen.lineTo((0, 500))
+            pen.lineTo((500, 0))
+            pen.closePath()
+            glyphs[name] = pen.glyph()
+
+        builder = FontBuilder(1000, isTTF=True)
+        builder.setupGlyphOrder(glyph_order)
+        builder.setupCharacterMap(names)
+        builder.setupGlyf(glyphs)
+        builder.setupHorizontalMetrics({name: (600, 0) for name in glyph_order})
+        builder.setupHorizontalHeader(ascent=800, descent=-200)
+        builder.setupNameTable({"familyName": "Test Sans", "styleName": "Regular"})
+        builder.setupOS2()
+        builder.setupPost()
+        builder.save(path)
+
+    def test_font_is_subset_to_site_characters(self):
+        call_command("subset_fonts", stdout=StringIO())
+
+        font = TTFont(os.path.join(self.fonts_dir, "test-sans-normal.woff2"))
+        characters = font.getBestCmap()
+        self.assertIn(ord("é"), characters)
+        self.assertNotIn(ord("Ж"), characters)
+
+    def test_base_template_uses_self_hosted_fonts(self):
+        call_command("subset_fonts", stdout=StringIO())
+
+        response = self.client.get("/")
+        self.assertContains(response, '<link rel="preload" href="/static/fonts/test-sans-normal.woff2"')
+        self.assertContains(response, 'font-family: "Test Sans";')
+        self.assertNotContains(response, "fonts.googleapis.com")
+
+
+class CriticalCSSTests(WagtailPageTestCase):
+    """
+    Tests for extracting and inlining above the fold CSS.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output)
+        self.path = os.path.join(output, "critical_css.json")
+        settings_override = self.settings(CRITICAL_CSS_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(load_critical_css.cache_clear)
+
+        homepage = Site.objects.get(is_default_site=True).root_page.specific
+        homepage.body = [
+            {"type": "hero", "value": {"heading": "Hello", "body_text": "World"}},
+        ]
+        homepage.save_revision().publish()
+
+    def test_extract_keeps_rules_matching_the_top_of_the_page(self):
+        css = """
+            body { margin: 0 }
+            .hero-block { display: flex }
+            .hero-block > p > a:hover { color: red }
+            .footer { display: none }
+            @media (min-width: 768px) { .hero-block { padding: 0 } .footer { padding: 0 } }
+            @font-face { font-family: "Test" }
+        """
+        html = (
+            '<html><body><header class="hero-block"><p><a>Hi</a></p></header>'
+            '<div>Text</div><div>Text</div><footer class="footer"></footer></body></html>'
+        )
+
+        critical = extract_critical_css(css, [html])
+
+        self.assertIn("body{margin:0}", critical)
+        self.assertIn("@media (min-width:768px){.hero-block{padding:0}}", critical)
+        self.assertIn("@font-face", critical)
+        self.assertNotIn(".footer", critical)
+        self.assertNotIn(":hover", critical)
+
+    @override_settings(CRITICAL_CSS_FOLD_ELEMENTS=3)
+    def test_placeholders_do_not_count_towards_the_fold(self):
+        css = ".hero-block{margin:0}.first{margin:0}.second{margin:0}.footer{margin:0}"
+        html = (
+            '<html><body><div data-userbar="/_userbar/3/"></div><nav></nav>'
+            '<header class="hero-block"><h1>Hi</h1></header>'
+            '<section class="first"><h2>First</h2></section>'
+            '<section class="second"><h2>Second</h2></section>'
+            '<footer class="footer"><p>Footer</p></footer></body></html>'
+        )
+
+        critical = extract_critical_css(css, [html])
+
+        self.assertIn(".first{margin:0}", critical)
+        self.assertIn(".second{margin:0}", critical)
+        self.assertNotIn(".footer", critical)
+
+    def test_base_template_inlines_critical_css(self):
+        call_command("build_critical_css", stdout=StringIO())
+
+        response = self.client.get("/")
+        self.assertContains(response, "<style>:root{")
+        self.assertContains(response, 'rel="preload" href="/static/styles.css" as="style"')
+
+    def test_outdated_critical_css_is_ignored(self):
+        with open(self.path, "w") as f:
+            json.dump(
+                {"fingerprint": "old", "templates": {"home/home_page.html": "a{}"}}, f
+            )
+
+        self.assertEqual(load_critical_css(), {})
+        response = self.client.get("/")
+        self.assertContains(
+            response, '<link rel="stylesheet" type="text/css" href="/static/styles.css" />'
+        )
+
+
+class StreamingPageTests(WagtailPageTestCase):
+    """
+    Tests for streamed page responses and preload links.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.body = [
+            {"type": "hero", "value": {"heading": "Hello", "body_text": "World"}},
+            {"type": "section", "value": {"title": "Streamed section", "content": []}},
+        ]
+        self.homepage.save_revision().publish()
+        # Stream the blocks rather than the body stored on publish
+        RenderedBody.objects.all().delete()
+
+    def test_responses_have_preload_links(self):
+        response = self.client.get("/")
+        self.assertIn("</static/styles.css>; rel=preload; as=style", response.headers["Link"])
+
+    @override_settings(PAGE_STREAMING=True)
+    def test_head_is_sent_before_body_blocks(self):
+        response = self.client.get("/")
+
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        self.assertIn("</head>", chunks[0])
+        self.assertNotIn("Hello", chunks[0])
+        self.assertIn("Hello", chunks[1])
+        self.assertIn("Streamed section", chunks[2])
+
+    @override_settings(PAGE_STREAMING=True)
+    async def test_asgi_responses_are_not_buffered(self):
+        response = await self.async_client.get("/")
+
+        self.assertTrue(response.is_async)
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+        self.assertIn("</head>", chunks[0])
+        self.assertIn("Hello", chunks[1])
+        self.assertIn("Streamed section", chunks[2])
+
+    @override_settings(PAGE_STREAMING=True)
+    def test_streamed_page_matches_rendered_page_and_is_cached(self):
+        streamed = b"".join(self.client.get("/").streaming_content)
+
+        cached = self.client.get("/")
+        self.assertFalse(cached.streaming)
+        self.assertEqual(cached.content, streamed)
+
+        get_page_cache().clear()
+        with self.settings(PAGE_STREAMING=False):
+            rendered = self.client.get("/").content
+        self.assertEqual(
+            [line.strip() for line in rendered.decode().splitlines() if line.strip()],
+            [line.strip() for line in streamed.decode().splitlines() if line.strip()],
+        )
+
+    @override_settings(PAGE_STREAMING=True)
+    def test_streamed_body_is_stored(self):
+        b"".join(self.client.get("/").streaming_content)
+        self.assertIn("Streamed section", RenderedBody.objects.get().html)
+
+        get_page_cache().clear()
+        with mock.patch.object(SectionBlock, "render") as render:
+            streamed = b"".join(self.client.get("/").streaming_content)
+        render.assert_not_called()
+        self.assertIn(b"Streamed section", streamed)
+
+
+class QueryBudgetMixin:
+    """
+    ``assertQueryBudget`` fails a test when a URL runs more queries than
+    budgeted, or repeats a query with different parameters (an N+1 loop).
+    """
+
+    def assertQueryBudget(self, url, queries, similar=0):
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+        stats = recorder.stats()
+        executed = "\n".join(
+            f"{i}. {sql}" for i, (sql, params, duration) in enumerate(recorder.queries, 1)
+        )
+        self.assertLessEqual(
+            stats["queries"], queries, f"{url} ran {stats['queries']} queries:\n{executed}"
+        )
+        self.assertLessEqual(
+            stats["similar"], similar, f"{url} repeated queries:\n{executed}"
+        )
+        return response
+
+
+class QueryBudgetTests(QueryBudgetMixin, WagtailPageTestCase):
+    """
+    Query budgets for the page serving path, and the query stats middleware.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(cache.clear)
+
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.body = [
+            {
+                "type": "section",
+                "value": {
+                    "title": f"Section {i}",
+                    "content": [
+                        {
+                            "type": "two_column",
+                            "value": {
+                                "image": Image.objects.create(
+                                    title=f"Image {i}", file=get_test_image_file()
+                                ).pk,
+                                "content": [{"type": "heading", "value": "<h4>Hi</h4>"}],
+                            },
+                        }
+                    ],
+                },
+            }
+            for i in range(5)
+        ]
+        self.homepage.save_revision().publish()
+        self.child = self.homepage.add_child(instance=HomePage(title="Child", slug="child"))
+        self.child.save_revision().publish()
+        run_pending()
+        Redirect.add_redirect("/old-page", self.child)
+        cache.clear()
+        # Loaded once per worker
+        get_redirect_table()
+        get_routing_table()
+
+    def test_page_budgets(self):
+        # The page, its ancestors, view restrictions and its stored body.
+        # Restrictions again before caching the response, as those pages must
+        # not be cached. Sites, routes and redirects come from tables.
+        budgets = {
+            "/": (5, 0),
+            "/child/": (5, 0),
+            "/old-page": (2, 0),
+        }
+        for url, (queries, similar) in budgets.items():
+            with self.subTest(url=url):
+                self.assertQueryBudget(url, queries, similar)
+
+    def test_cached_page_budget(self):
+        self.client.get("/")
+        self.assertQueryBudget("/", 3)
+
+    def test_budget_catches_repeated_queries(self):
+        # Without the image prefetch every two column block loads its own image
+        RenderedBody.objects.all().delete()
+        with mock.patch("home.models.prefetch_images", nullcontext):
+            with self.assertRaisesMessage(AssertionError, "repeated queries"):
+                self.assertQueryBudget("/", 100)
+
+    @override_settings(DEBUG=True)
+    def test_debug_responses_have_query_stats_header(self):
+        response = self.client.get("/")
+        self.assertRegex(
+            response.headers["X-Query-Stats"],
+            r"^queries=\d+; sql_ms=[\d.]+; duplicates=\d+; similar=\d+$",
+        )
+
+    def test_production_requests_are_logged(self):
+        with self.assertLogs("resolve.middleware", "INFO") as logs:
+            self.client.get("/child/")
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["path"], "/child/")
+        self.assertEqual(line["status"], 200)
+        self.assertGreater(line["queries"], 0)
+        self.assertNotIn("X-Query-Stats", self.client.get("/child/").headers)
+
+    @override_settings(QUERY_BUDGET=1)
+    def test_requests_over_budget_are_logged_as_warnings(self):
+        with self.assertLogs("resolve.middleware", "WARNING") as logs:
+            self.client.get("/child/")
+
+        self.assertIn("over the budget of 1", logs.output[0])
+
+
+class BlockTimingTests(WagtailPageTestCase):
+    """
+    Tests for Server-Timing block render timings.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        get_block_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.body = [
+            {"type": "hero", "value": {"heading": "Hello", "body_text": "World"}},
+            *[
+                {
+                    "type": "section",
+                    "value": {
+                        "title": f"Section {i}",
+                        "content": [
+                            {
+                                "type": "features",
+                                "value": {
+                                    "features": [{"heading": "A", "description": "<p>B</p>"}]
+                                },
+                            },
+                        ],
+                    },
+                }
+                for i in range(2)
+            ],
+        ]
+        self.homepage.save_revision().publish()
+        # Time the blocks rather than the body and fragments stored on publish
+        RenderedBody.objects.all().delete()
+        get_block_cache().clear()
+
+    def server_timing(self, response):
+        return {
+            metric.split(";")[0]: metric for metric in response.headers["Server-Timing"].split(", ")
+        }
+
+    def test_rendered_page_reports_nested_block_types(self):
+        metrics = self.server_timing(self.client.get("/"))
+
+        self.assertEqual(
+            set(metrics), {"blocks", "HeroBlock", "SectionBlock", "FeaturesBlock"}
+        )
+        self.assertIn('desc="2x"', metrics["SectionBlock"])
+        self.assertIn('desc="1x"', metrics["HeroBlock"])
+
+    @override_settings(BLOCK_TIMING_TOP=1)
+    def test_only_slowest_block_types_are_reported(self):
+        self.assertEqual(len(self.server_timing(self.client.get("/"))), 2)
+
+    @override_settings(BLOCK_TIMING_COMMENT=True)
+    def test_comment_is_not_cached(self):
+        first = self.client.get("/").content.decode()
+        self.assertIn("<!-- Block render time", first)
+        self.assertIn("SectionBlock:", first)
+
+        cached = self.client.get("/")
+        self.assertNotIn("Block render time", cached.content.decode())
+        self.assertNotIn("Server-Timing", cached.headers)
+
+    @override_settings(BLOCK_TIMING=False)
+    def test_timing_can_be_disabled(self):
+        self.assertNotIn("Server-Timing", self.client.get("/").headers)
+
+    def test_nested_time_is_not_counted_twice(self):
+        timings = BlockTimings()
+        outer = timings.start()
+        inner = timings.start()
+        time.sleep(0.02)
+        timings.stop("Inner", inner)
+        timings.stop("Outer", outer)
+
+        self.assertEqual(timings.counts, {"Inner": 1, "Outer": 1})
+        self.assertGreaterEqual(timings.durations["Inner"], 0.02)
+        self.assertLess(timings.durations["Outer"], 0.02)
+
+
+class SQLiteTuningTests(WagtailPageTestCase):
+    """
+    Tests for SQLITE_PRAGMAS and the benchmark_sqlite management command.
+    """
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_connections(self):
+        self.assertEqual(self.pragma("synchronous"), 1)
+        self.assertEqual(self.pragma("busy_timeout"), settings.SQLITE_PRAGMAS["busy_timeout"])
+        self.assertEqual(self.pragma("cache_size"), settings.SQLITE_PRAGMAS["cache_size"])
+
+    def test_benchmark_compares_default_and_tuned_settings(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        output = os.path.join(output_dir, "results.json")
+
+        call_command(
+            "benchmark_sqlite", readers=1, writers=1, duration=0.2, output=output,
+            stdout=StringIO(),
+        )
+
+        with open(output) as f:
+            results = json.load(f)
+        self.assertEqual(results["default"]["pragmas"], {})
+        self.assertEqual(results["tuned"]["pragmas"]["journal_mode"], "wal")
+        self.assertEqual(
+            results["tuned"]["persistent_connections"],
+            settings.DATABASES["default"]["CONN_MAX_AGE"] != 0,
+        )
+        for result in results.values():
+            self.assertGreater(result["reads_per_second"], 0)
+            self.assertGreater(result["writes_per_second"], 0)
+
+
+class CachedPageApplicationTests(WagtailPageTestCase):
+    """
+    Tests for the ASGI fast path serving cached pages without Django.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.body = [
+            {"type": "hero", "value": {"heading": "Hello", "body_text": "World"}},
+        ]
+        self.homepage.save_revision().publish()
+
+        self.django_requests = 0
+        django_application = get_asgi_application()
+
+        async def counting_application(scope, receive, send):
+            self.django_requests += 1
+            await django_application(scope, receive, send)
+
+        self.application = CachedPageApplication(counting_application)
+
+    async def request(self, path="/", method="GET", headers=(), query_string=b""):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query_string,
+            "root_path": "",
+            "headers": [(b"host", b"localhost"), *headers],
+            "client": ("127.0.0.1", 50000),
+            "server": ("localhost", 80),
+        }
+        messages = []
+        requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            # Django listens for a disconnect until the response is sent
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        await self.application(scope, receive, send)
+        headers = {k.decode().lower(): v.decode() for k, v in messages[0]["headers"]}
+        body = b"".join(m.get("body", b"") for m in messages[1:])
+        return messages[0]["status"], headers, body
+
+    async def test_cached_page_is_served_without_django(self):
+        status, headers, body = await self.request()
+        self.assertEqual(status, 200)
+        self.assertEqual(self.django_requests, 1)
+
+        # Outside Django, any query on the event loop would raise
+        # SynchronousOnlyOperation
+        cached_status, cached_headers, cached_body = await self.request()
+
+        self.assertEqual(self.django_requests, 1)
+        self.assertEqual(cached_status, 200)
+        self.assertEqual(cached_body, body)
+        self.assertIn("Hello", cached_body.decode())
+        self.assertNotIn("server-timing", cached_headers)
+        headers.pop("server-timing", None)
+        self.assertEqual(cached_headers, headers)
+
+    async def test_head_and_conditional_requests(self):
+        status, headers, body = await self.request()
+
+        status, head_headers, head_body = await self.request(method="HEAD")
+        self.assertEqual(status, 200)
+        self.assertEqual(head_body, b"")
+        self.assertEqual(head_headers["content-length"], str(len(body)))
+
+        status, not_modified_headers, body = await self.request(
+            headers=[(b"if-none-match", headers["etag"].encode())]
+        )
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(not_modified_headers["etag"], headers["etag"])
+        self.assertEqual(self.django_requests, 1)
+
+    async def test_publishing_falls_back_to_django(self):
+        await self.request()
+
+        self.homepage.body = [
+            {"type": "hero", "value": {"heading": "Updated", "body_text": "World"}},
+        ]
+        await sync_to_async(lambda: self.homepage.save_revision().publish())()
+
+        status, headers, body = await self.request()
+        self.assertEqual(self.django_requests, 2)
+        self.assertIn("Updated", body.decode())
+
+    async def test_session_cookie_bypasses_fast_path(self):
+        await self.request()
+        await self.request(
+            headers=[(b"cookie", f"{settings.SESSION_COOKIE_NAME}=abc".encode())]
+        )
+        self.assertEqual(self.django_requests, 2)
+
+    async def test_restricting_a_cached_page_falls_back_to_django(self):
+        self.assertEqual((await self.request())[0], 200)
+
+        await sync_to_async(PageViewRestriction.objects.create)(
+            page=self.homepage, restriction_type=PageViewRestriction.LOGIN
+        )
+
+        status, headers, body = await self.request()
+        self.assertEqual(self.django_requests, 2)
+        self.assertEqual(status, 302)
+        self.assertNotIn("Hello", body.decode())
+
+    async def test_restricted_pages_are_not_cached(self):
+        restriction = await sync_to_async(PageViewRestriction.objects.create)(
+            page=self.homepage, restriction_type=PageViewRestriction.PASSWORD, password="secret"
+        )
+        # As a visitor who entered the password, without a session cookie
+        with mock.patch.object(PageViewRestriction, "accept_request", return_value=True):
+            status, headers, body = await self.request()
+            self.assertEqual(status, 200)
+            await self.request()
+        self.assertEqual(self.django_requests, 2)
+
+        await sync_to_async(restriction.delete)()
+        status, headers, body = await self.request()
+        self.assertEqual(status, 200)
+        self.assertEqual(self.django_requests, 3)
+
+    async def test_deploy_renders_cached_pages_again(self):
+        await self.request()
+        await self.request()
+        self.assertEqual(self.django_requests, 1)
+
+        with mock.patch("home.cache.get_deploy_version", return_value=("deployed", 0.0)):
+            status, headers, body = await self.request()
+            self.assertEqual(status, 200)
+            self.assertEqual(self.django_requests, 2)
+            await self.request()
+        self.assertEqual(self.django_requests, 2)
+
+    async def test_moved_pages_are_not_served_at_their_old_url(self):
+        def add_pages():
+            moved = self.homepage.add_child(instance=HomePage(title="A", slug="a"))
+            moved.save_revision().publish()
+            target = self.homepage.add_child(instance=HomePage(title="B", slug="b"))
+            target.save_revision().publish()
+            return moved, target
+
+        moved, target = await sync_to_async(add_pages)()
+        status, headers, body = await self.request("/a/")
+        self.assertEqual(status, 200)
+
+        await sync_to_async(moved.move)(target, pos="last-child")
+        status, headers, body = await self.request("/a/")
+        self.assertEqual(status, 301)
+        self.assertEqual(headers["location"], "/b/a/")
+
+    async def test_query_strings_are_left_to_django(self):
+        await self.request()
+        for query_string in (b"utm=1", b"utm=1", b"utm=2"):
+            status, headers, body = await self.request(query_string=query_string)
+            self.assertEqual(status, 200)
+        self.assertEqual(self.django_requests, 4)
+
+        url_keys = [key for key in get_page_cache()._cache if ":home:url:" in key]
+        self.assertEqual(len(url_keys), 1)
+
+    async def test_not_found_is_not_cached(self):
+        await self.request("/missing/")
+        status, headers, body = await self.request("/missing/")
+        self.assertEqual(status, 404)
+        self.assertEqual(self.django_requests, 2)
+
+
+PUBLIC_MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "resolve.middleware.AnonymousRequestMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "resolve.middleware.CachedRedirectMiddleware",
+    "resolve.middleware.PageRoutingMiddleware",
+]
+
+
+@override_settings(ROOT_URLCONF="resolve.urls_public", MIDDLEWARE=PUBLIC_MIDDLEWARE)
+class PublicProfileTests(WagtailPageTestCase):
+    """
+    Tests for the public URLconf and the middleware of resolve.settings.public.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.body = [
+            {"type": "hero", "value": {"heading": "Hello", "body_text": "World"}},
+        ]
+        self.homepage.save_revision().publish()
+
+    def test_pages_are_served_without_the_admin(self):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Hello")
+
+        self.assertEqual(self.client.get("/admin/").status_code, 404)
+        self.assertEqual(self.client.get("/django-admin/").status_code, 404)
+
+    def test_anonymous_get_skips_session_middleware(self):
+        response = self.client.get("/")
+
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+        self.assertNotIn("Vary", response)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_session_cookie_runs_session_middleware(self):
+        self.login()
+
+        response = self.client.get("/")
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+        self.assertIn("_auth_user_id", response.wsgi_request.session)
+
+    def test_post_runs_session_middleware(self):
+        response = self.client.post("/")
+        self.assertTrue(hasattr(response.wsgi_request, "_messages"))
+
+
+TIERED_CACHES = {
+    "tiered": {
+        "BACKEND": "resolve.cache.TieredCache",
+        "LOCATION": "tiered-shared",
+        "OPTIONS": {"L1_MAX_ENTRIES": 2, "L1_MAX_BYTES": 1024, "SYNC_INTERVAL": 0},
+    },
+    "tiered-shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tiered-shared",
+    },
+}
+
+
+@override_settings(CACHES={**TEST_CACHES, **TIERED_CACHES})
+class TieredCacheTests(WagtailPageTestCase):
+    """
+    Tests for the in-process cache in front of the shared cache, and purging.
+    """
+
+    def setUp(self):
+        self.cache = caches["tiered"]
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def other_process(self):
+        other = TieredCache("tiered-shared", TIERED_CACHES["tiered"])
+        other.store = Store()
+        return other
+
+    def test_values_are_read_from_process_then_shared_cache(self):
+        self.cache.set("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.stats()["l1_hits"], 1)
+
+        self.assertEqual(self.other_process().get("a"), 1)
+        self.assertIsNone(self.cache.get("missing"))
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["l1_hit_ratio"], 0.5)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for key in "abc":
+            self.cache.set(key, key)
+        self.cache.set("large", "x" * 2048)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["l1_entries"], 2)
+        self.assertEqual(stats["l1_evictions"], 1)
+        self.assertLessEqual(stats["l1_bytes"], 1024)
+
+        # Evicted from the process, still in the shared cache
+        self.assertEqual(self.cache.get("a"), "a")
+        self.assertEqual(self.cache.get("large"), "x" * 2048)
+        self.assertEqual(self.cache.stats()["l2_hits"], 2)
+
+    def test_deletes_reach_other_processes(self):
+        other = self.other_process()
+        self.cache.set("a", 1)
+        self.assertEqual(other.get("a"), 1)
+
+        self.cache.delete("a")
+        self.assertIsNone(other.get("a"))
+
+        # Overwrites in place are not propagated, only deletes
+        other.get("a")
+        self.cache.set("b", 1)
+        other.get("b")
+        self.cache.set("b", 2)
+        self.assertEqual(other.get("b"), 1)
+
+    def test_deletes_of_several_processes_all_reach_each_process(self):
+        other = self.other_process()
+        other.set("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+
+        # This process deleting a key as well must not hide the other delete
+        other.delete("a")
+        self.cache.delete("b")
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_shared_stats_sum_all_processes(self):
+        other = self.other_process()
+        self.cache.set("a", 1)
+        self.cache.get("a")
+        other.get("a")
+        other.get("missing")
+        # Each process flushes its counters when it next refreshes
+        other.refresh()
+
+        stats = self.cache.shared_stats()
+        self.assertEqual(stats["l1_hits"], 1)
+        self.assertEqual(stats["l2_hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+        out = StringIO()
+        call_command("cache_stats", stdout=out)
+        self.assertIn("tiered: 66.7% hits", out.getvalue())
+
+
+class FrontendCachePurgeTests(WagtailPageTestCase):
+    """
+    Tests for purging the ASGI application's responses through frontend_cache.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.save_revision().publish()
+
+    def test_publishing_purges_page_urls(self):
+        with mock.patch.object(PageCacheBackend, "purge") as purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.homepage.save_revision().publish()
+
+        purge.assert_called_once_with("http://localhost/")
+
+    def test_purge_drops_stored_response(self):
+        version = get_page_version(self.homepage.pk)
+        async_to_sync(acache_url_response)(
+            "localhost", "/", self.homepage.pk, version, "key", []
+        )
+        get_page_cache().set("key", (200, "text/html", b"Cached"))
+        self.assertIsNotNone(async_to_sync(aget_url_response)("localhost", "/"))
+
+        PageCacheBackend({}).purge("http://localhost/")
+        self.assertIsNone(async_to_sync(aget_url_response)("localhost", "/"))
+
+
+class RichTextMemoizationTests(WagtailPageTestCase):
+    """
+    Tests for memoized rich text expansion and its invalidation.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        get_block_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.target = HomePage(title="Target", slug="target")
+        self.homepage.add_child(instance=self.target)
+        self.target.save_revision().publish()
+
+        self.link = f'<p><a linktype="page" id="{self.target.pk}">Target</a></p>'
+        self.homepage.body = [
+            {
+                "type": "section",
+                "value": {
+                    "title": "Links",
+                    "content": [{"type": "paragraph", "value": self.link}],
+                },
+            },
+        ]
+        # The reference index is updated once the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.homepage.save_revision().publish()
+
+    def test_expansion_is_memoized(self):
+        block = MemoizedRichTextBlock()
+        self.assertIn('href="/target/"', str(block.to_python(self.link)))
+
+        with self.assertNumQueries(0):
+            html = str(block.to_python(self.link))
+        self.assertIn('href="/target/"', html)
+
+    def test_changing_linked_page_drops_rich_text_fragments_and_pages(self):
+        self.assertContains(self.client.get("/"), 'href="/target/"')
+
+        self.target.slug = "moved"
+        self.target.save_revision().publish()
+
+        self.assertIn('href="/moved/"', str(MemoizedRichTextBlock().to_python(self.link)))
+        self.assertContains(self.client.get("/"), 'href="/moved/"')
+
+    def test_changing_linked_page_changes_validators(self):
+        response = self.client.get("/")
+
+        self.target.slug = "moved"
+        self.target.save_revision().publish()
+
+        revalidated = self.client.get("/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertContains(revalidated, 'href="/moved/"')
+        self.assertNotEqual(revalidated["ETag"], response["ETag"])
+
+    def test_changing_linked_document_drops_rich_text(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        document = Document.objects.create(
+            title="Report", file=ContentFile(b"Report", name="report.txt")
+        )
+        source = f'<p><a linktype="document" id="{document.pk}">Report</a></p>'
+        block = MemoizedRichTextBlock()
+        self.assertIn(f"/documents/{document.pk}/report.txt", str(block.to_python(source)))
+
+        document.file.save("annual.txt", ContentFile(b"Annual"))
+
+        self.assertIn(f"/documents/{document.pk}/annual.txt", str(block.to_python(source)))
+
+
+class UserbarTests(WagtailPageTestCase):
+    """
+    Tests for the user bar fetched separately from the page.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.save_revision().publish()
+        self.userbar_url = reverse("userbar", args=[self.homepage.pk])
+
+    def test_page_has_placeholder_instead_of_userbar(self):
+        self.login()
+        response = self.client.get("/")
+
+        self.assertContains(response, f'data-userbar="{self.userbar_url}"')
+        self.assertNotContains(response, "wagtail-userbar")
+
+    def test_anonymous_page_view_does_not_vary_on_cookie(self):
+        response = self.client.get("/")
+        self.assertNotIn("Cookie", response.get("Vary", ""))
+
+    def test_userbar_is_only_rendered_for_editors(self):
+        self.assertEqual(self.client.get(self.userbar_url).status_code, 204)
+
+        self.login()
+        response = self.client.get(self.userbar_url)
+        self.assertContains(response, "wagtail-userbar")
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_editor_cookie_follows_login(self):
+        self.login()
+        response = self.client.get("/")
+        self.assertEqual(response.cookies["editor"].value, "1")
+
+        # Logging out ends the session, the browser keeps the editor cookie
+        self.client.logout()
+        self.client.cookies["editor"] = "1"
+        response = self.client.get("/")
+        self.assertEqual(response.cookies["editor"].value, "")
+
+
+class CachedRedirectTests(WagtailPageTestCase):
+    """
+    Tests for redirects looked up in the in-memory redirect table.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.save_revision().publish()
+        self.child = self.homepage.add_child(instance=HomePage(title="Child", slug="child"))
+        self.child.save_revision().publish()
+
+    def assertRedirect(self, path, url, status=301):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response["Location"], url)
+
+    def test_redirects_to_links_and_pages(self):
+        Redirect.objects.create(old_path="/gone", redirect_link="https://example.com/")
+        Redirect.add_redirect("/moved", self.child, is_permanent=False)
+
+        self.assertRedirect("/gone", "https://example.com/")
+        self.assertRedirect("/gone/?b=2&a=1", "https://example.com/")
+        self.assertRedirect("/moved", "/child/", status=302)
+
+    def test_missing_pages_run_no_redirect_queries(self):
+        Redirect.objects.create(old_path="/gone", redirect_link="https://example.com/")
+        get_redirect_table()
+
+        with mock.patch.object(Redirect.objects, "get_queryset") as get_queryset:
+            response = self.client.get("/missing/")
+        self.assertEqual(response.status_code, 404)
+        get_queryset.assert_not_called()
+
+    def test_wildcard_redirects_paths_below(self):
+        Redirect.objects.create(old_path="/news/*", redirect_link="https://example.com/news/")
+        Redirect.objects.create(old_path="/news/2020/*", redirect_link="https://example.com/2020/")
+
+        self.assertRedirect("/news", "https://example.com/news/")
+        self.assertRedirect("/news/2019/title/", "https://example.com/news/")
+        self.assertRedirect("/news/2020/title/?page=2", "https://example.com/2020/")
+        self.assertEqual(self.client.get("/newsletter/").status_code, 404)
+
+    def test_root_wildcard_redirects_every_missing_path(self):
+        Redirect.objects.create(old_path="/*", redirect_link="https://example.com/")
+        Redirect.objects.create(old_path="/news/*", redirect_link="https://example.com/news/")
+
+        self.assertRedirect("/missing/", "https://example.com/")
+        self.assertRedirect("/news/title/", "https://example.com/news/")
+        self.assertEqual(self.client.get("/child/").status_code, 200)
+
+    def test_site_specific_redirect_wins(self):
+        site = Site.objects.get(is_default_site=True)
+        Redirect.objects.create(old_path="/gone", redirect_link="https://example.com/all/")
+        Redirect.objects.create(old_path="/gone", site=site, redirect_link="https://example.com/site/")
+        other = Site.objects.create(hostname="other.test", root_page=self.child)
+        Redirect.objects.create(old_path="/elsewhere", site=other, redirect_link="https://example.com/")
+
+        self.assertRedirect("/gone", "https://example.com/site/")
+        self.assertEqual(self.client.get("/elsewhere/").status_code, 404)
+
+    def test_table_follows_saves_and_deletes(self):
+        redirect = Redirect.objects.create(old_path="/gone", redirect_link="https://example.com/")
+        self.assertRedirect("/gone", "https://example.com/")
+
+        redirect.redirect_link = "https://example.com/new/"
+        redirect.save()
+        self.assertRedirect("/gone", "https://example.com/new/")
+
+        redirect.delete()
+        self.assertEqual(self.client.get("/gone/").status_code, 404)
+
+    def test_benchmark_reports_lookups_and_keeps_no_redirects(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        output = os.path.join(output_dir, "results.json")
+
+        call_command(
+            "benchmark_redirects", count=300, lookups=20, output=output, stdout=StringIO()
+        )
+
+        with open(output) as f:
+            results = json.load(f)
+        self.assertEqual(results["redirects"], 300)
+        self.assertGreater(results["lookups"]["wagtail_miss"]["queries_per_lookup"], 0)
+        for kind in ("miss", "hit", "wildcard_hit"):
+            self.assertEqual(results["lookups"][f"table_{kind}"]["queries_per_lookup"], 0)
+        self.assertFalse(Redirect.objects.exists())
+
+
+class PageRoutingTests(WagtailPageTestCase):
+    """
+    Tests for sites and pages found in the in-memory routing table.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.homepage.save_revision().publish()
+        self.child = self.homepage.add_child(instance=HomePage(title="Child", slug="child"))
+        self.child.save_revision().publish()
+
+    def test_pages_are_routed_without_walking_the_tree(self):
+        get_routing_table()
+        with mock.patch.object(Page, "route") as route:
+            self.assertEqual(self.client.get("/").status_code, 200)
+            self.assertEqual(self.client.get("/child/").status_code, 200)
+        route.assert_not_called()
+
+    def test_unknown_paths_are_routed_by_wagtail(self):
+        self.assertEqual(self.client.get("/child/missing/").status_code, 404)
+
+        # Created without publishing, so the table does not know it yet
+        self.child.add_child(instance=HomePage(title="New", slug="new"))
+        self.assertEqual(self.client.get("/child/new/").status_code, 200)
+
+    def test_table_follows_publishing_and_moves(self):
+        self.child.unpublish()
+        self.assertEqual(self.client.get("/child/").status_code, 404)
+        self.child.save_revision().publish()
+
+        other = self.homepage.add_child(instance=HomePage(title="Other", slug="other"))
+        other.save_revision().publish()
+        self.child.move(other, pos="last-child")
+        self.assertEqual(self.client.get("/child/").status_code, 404)
+        self.assertEqual(self.client.get("/other/child/").status_code, 200)
+
+        self.child.refresh_from_db()
+        self.child.slug = "renamed"
+        self.child.save_revision().publish()
+        self.assertEqual(self.client.get("/other/renamed/").status_code, 200)
+
+    def test_site_matches_wagtail(self):
+        default = Site.objects.get(is_default_site=True)
+        Site.objects.create(hostname="other.test", root_page=self.child)
+        Site.objects.create(hostname="ports.test", port=8000, root_page=self.child)
+        Site.objects.create(hostname="ports.test", port=8001, root_page=self.homepage)
+        table = get_routing_table()
+
+        factory = RequestFactory()
+        for host in ["localhost", "other.test", "ports.test:8000", "ports.test:8001", "ports.test", "unknown.test"]:
+            with self.subTest(host=host):
+                request = factory.get("/", HTTP_HOST=host)
+                self.assertEqual(table.site_for_request(request), Site._find_for_request(request))
+
+        response = self.client.get("/", HTTP_HOST="other.test")
+        self.assertEqual(response.context["page"], self.child)
+        default.delete()
+        self.assertEqual(self.client.get("/", HTTP_HOST="unknown.test").status_code, 404)
+
+    def test_version_is_checked_once_per_interval(self):
+        loads = []
+
+        def load():
+            loads.append(1)
+            return len(loads)
+
+        table = ProcessTable("tests:table", load, interval=60)
+        other_process = ProcessTable("tests:table", list, interval=60)
+        self.assertEqual(table.get(), 1)
+
+        other_process.invalidate()
+        with mock.patch.object(caches["default"], "get") as get:
+            self.assertEqual(table.get(), 1)
+        get.assert_not_called()
+
+        table.checked_at -= 60
+        self.assertEqual(table.get(), 2)
+        # Seen at once in the process that changed it
+        table.invalidate()
+        self.assertEqual(table.get(), 3)
+
+    def test_pages_below_custom_routes_are_left_to_wagtail(self):
+        class RoutablePage:
+            def route(self, request, path_components):
+                pass
+
+        table = RoutingTable(
+            [],
+            [
+                ("/home/", 1, HomePage, True),
+                ("/home/routable/", 2, RoutablePage, True),
+                ("/home/routable/below/", 3, HomePage, True),
+                ("/home/draft/", 4, HomePage, False),
+            ],
+        )
+        self.assertEqual(list(table.pages), ["/home/"])
+
+
+class RenderedBodyTests(WagtailPageTestCase):
+    """
+    Tests for page bodies rendered on publish and stored with the revision.
+    """
+
+    def setUp(self):
+        get_page_cache().clear()
+        get_block_cache().clear()
+        self.homepage = Site.objects.get(is_default_site=True).root_page.specific
+        self.publish("Stored section")
+
+    def publish(self, title):
+        self.homepage.body = [
+            {"type": "section", "value": {"title": title, "content": []}},
+        ]
+        self.homepage.save_revision().publish()
+        run_pending()
+        get_page_cache().clear()
+
+    def test_publishing_stores_body_for_rendering(self):
+        self.homepage.refresh_from_db()
+        stored = RenderedBody.objects.get(page=self.homepage)
+        self.assertEqual(stored.revision_id, self.homepage.live_revision_id)
+        self.assertIn("Stored section", stored.html)
+
+        with mock.patch("home.models.render_body") as render_body:
+            response = self.client.get("/")
+        render_body.assert_not_called()
+        self.assertContains(response, "Stored section")
+
+        self.publish("Republished section")
+        self.assertContains(self.client.get("/"), "Republished section")
+        self.assertEqual(RenderedBody.objects.count(), 1)
+
+    def test_drafts_are_previewed_from_blocks(self):
+        self.homepage.body = [
+            {"type": "section", "value": {"title": "Draft section", "content": []}},
+        ]
+        self.homepage.save_revision()
+
+        self.login()
+        response = self.client.get(f"/admin/pages/{self.homepage.pk}/view_draft/")
+        self.assertContains(response, "Draft section")
+        self.assertContains(self.client.get("/"), "Stored section")
+
+    def test_bodies_for_other_templates_are_rendered_again(self):
+        with mock.patch("home.materialize.get_templates_fingerprint", return_value="deployed"):
+            self.assertContains(self.client.get("/"), "Stored section")
+            self.assertEqual(RenderedBody.objects.get().fingerprint, "deployed")
+
+    def test_command_renders_missing_and_stale_bodies(self):
+        RenderedBody.objects.update(fingerprint="old")
+        child = self.homepage.add_child(instance=HomePage(title="Child", slug="child"))
+        child.save_revision().publish()
+        run_pending()
+
+        stdout = StringIO()
+        call_command("materialize_pages", stdout=stdout)
+        self.assertIn("Rendered 1 page bodies", stdout.getvalue())
+        self.assertEqual(RenderedBody.objects.filter(fingerprint="old").count(), 0)
+
+        call_command("materialize_pages", stdout=stdout)
+        self.assertIn("Rendered 0 page bodies", stdout.getvalue())
+
+    def test_forced_enqueue_renders_current_bodies_again(self):
+        run_pending()
+        RenderedBody.objects.update(html="Old")
+
+        call_command("materialize_pages", force=True, enqueue=True, stdout=StringIO())
+        self.assertEqual(run_pending(), 1)
+        self.assertNotEqual(RenderedBody.objects.get().html, "Old")
+
+
+calls = []
+
+
+@task(concurrency=1, max_attempts=2)
+def record_call(value):
+    calls.append(value)
+
+
+@task(max_attempts=2, retry_delay=60)
+def fail():
+    raise ValueError("Failed")
+
+
+class TaskQueueTests(WagtailPageTestCase):
+    """
+    Tests for the job queue, its workers and the work queued on publish.
+    """
+
+    def setUp(self):
+        calls.clear()
+
+    def test_pending_jobs_are_deduplicated_by_key(self):
+        first = record_call.enqueue(1, key="record")
+        self.assertEqual(record_call.enqueue(2, key="record"), first)
+        self.assertEqual(Job.objects.count(), 1)
+
+        # The running job may miss changes made since it started
+        self.assertEqual(claim(), first)
+        record_call.enqueue(3, key="record")
+        self.assertEqual(Job.objects.filter(status=Job.PENDING).count(), 1)
+
+        run(first)
+        run_pending()
+        self.assertEqual(calls, [1, 3])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_jobs_are_retried_later_then_kept(self):
+        job = fail.enqueue()
+        with self.assertLogs("home.tasks", "ERROR"):
+            self.assertEqual(run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(run_pending(), 0)
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs("home.tasks", "ERROR"):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn("ValueError: Failed", job.error)
+
+    def test_concurrency_limit(self):
+        record_call.enqueue(1)
+        record_call.enqueue(2)
+        running = claim()
+        self.assertIsNone(claim())
+
+        # Taken over once its worker is gone
+        Job.objects.filter(pk=running.pk).update(locked_until=timezone.now())
+        self.assertEqual(claim(), running)
+
+        run(running)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, [1, 2])
+
+    def test_publishing_queues_renditions_and_body(self):
+        homepage = Site.objects.get(is_default_site=True).root_page.specific
+        homepage.save_revision().publish()
+
+        self.assertFalse(RenderedBody.objects.exists())
+        self.assertEqual(
+            sorted(Job.objects.values_list("key", flat=True)),
+            [f"materialize:{homepage.pk}", f"renditions:{homepage.pk}"],
+        )
+
+        stdout = StringIO()
+        call_command("run_tasks", once=True, stdout=stdout)
+        self.assertIn("Ran 2 jobs", stdout.getvalue())
+        self.assertTrue(RenderedBody.objects.filter(page=homepage).exists())
+
+    def test_worker_processes_start_with_spawn(self):
+        context = multiprocessing.get_context("spawn")
+        stop = context.Event()
+        stop.set()
+        with mock.patch("django.setup") as setup, mock.patch("signal.signal"):
+            run_worker(stop, 0)
+        setup.assert_called_once()
+
+        # A fresh interpreter, which imports the worker before Django is set up
+        process = context.Process(target=run_worker, args=(stop, 0))
+        process.start()
+        process.join(60)
+        self.assertEqual(process.exitcode, 0)
@@ -0,0 +1,93 @@
+"""Render time per block type, reported as ``Server-Timing`` and an HTML comment."""
+
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Timings of the page currently being rendered, None when not recording
+block_timings = ContextVar("block_timings", default=None)
+
+
+class BlockTimings:
+    """
+    Self time per block type: the time spent rendering a block minus the time
+    spent in timed blocks nested inside it, so the durations add up to the
+    total block render time.
+    """
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = Counter()
+        # Time spent in nested blocks, for each block currently rendering
+        self.nested = []
+
+    def start(self):
+        self.nested.append(0.0)
+        return time.perf_counter()
+
+    def stop(self, name, started):
+        elapsed = time.perf_counter() - started
+        self.durations[name] += elapsed - self.nested.pop()
+        self.counts[name] += 1
+        if self.nested:
+            self.nested[-1] += elapsed
+
+    def top(self, count=None):
+        """``(name, seconds, renders)`` for the slowest block types first."""
+        ranked = sorted(self.durations.items(), key=lambda item: item[1], reverse=True)
+        return [(name, seconds, self.counts[name]) for name, seconds in ranked[:count]]
+
+    def total(self):
+        return sum(self.durations.values())
+
+
+@contextmanager
+def record_block_timings():
+    """Time blocks rendered inside the block, if ``BLOCK_TIMING`` is enabled."""
+    if not getattr(settings, "BLOCK_TIMING", False):
+        yield None
+        return
+
+    timings = BlockTimings()
+    token = block_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        block_timings.reset(token)
+
+
+def server_timing(timings):
+    """``Server-Timing`` header value with the total and the slowest block types."""
+    metrics = [f'blocks;dur={timings.total() * 1000:.2f};desc="Blocks"']
+    for name, seconds, renders in timings.top(getattr(settings, "BLOCK_TIMING_TOP", 5)):
+        metrics.append(f'{name};dur={seconds * 1000:.2f};desc="{renders}x"')
+    return ", ".join(metrics)
+
+
+def timing_comment(timings):
+    lines = [
+        f"{name}: {seconds * 1000:.2f}ms in {renders} renders"
+        for name, seconds, renders in timings.top(getattr(settings, "BLOCK_TIMING_TOP", 5))
+    ]
+    return "\n<!-- Block render time %.2fms\n%s\n-->\n" % (
+        timings.total() * 1000,
+        "\n".join(lines),
+    )
+
+
+def add_block_timings(response, timings):
+    """
+    Report ``timings`` on a rendered response. Call this after the response has
+    been cached, the comment only describes this particular render.
+    """
+    if timings is None or not timings.counts:
+        return response
+
+    response.headers["Server-Timing"] = server_timing(timings)
+    if getattr(settings, "BLOCK_TIMING_COMMENT", False):
+        response.content += timing_comment(timings).encode(response.charset)
+
+    return response
@@ -0,0 +1,22 @@
+"""
+ASGI config for resolve project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Cached pages are answered by ``home.asgi.CachedPageApplication`` without
+entering Django, everything else is handled by Django as usual.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "resolve.settings.dev")
+
+django_application = get_asgi_application()
+
+from home.asgi import CachedPageApplication  # noqa: E402, needs Django set up
+
+application = CachedPageApplication(django_application)
@@ -0,0 +1,314 @@
+"""Cache backend keeping recently used entries in process, in front of a shared cache, and per-process tables."""
+
+import pickle
+import time
+import uuid
+from collections import Counter, OrderedDict
+from threading import Lock
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# In-process stores by LOCATION, shared by the backend instances of all threads
+_stores = {}
+
+MISSING = object()
+
+GENERATION_KEY = "tiered:generation"
+STATS_KEY_PREFIX = "tiered:stats"
+STATS = ("l1_hits", "l2_hits", "misses", "sets", "deletes", "l1_evictions")
+
+
+class Store:
+    """Size limited LRU of pickled values, with the counters since the last sync."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = Lock()
+        self.generation = None
+        self.synced_at = 0.0
+        self.stats = Counter()
+        self.unsynced = Counter()
+
+    def count(self, name):
+        self.stats[name] += 1
+        self.unsynced[name] += 1
+
+
+class TieredCache(BaseCache):
+    """
+    An in-process LRU cache (L1) in front of the cache named by ``LOCATION``
+    (L2), which the worker processes share.
+
+    Reads are answered from L1 when possible, values read from or written to
+    L2 are kept in L1. Deletes change a generation token in L2, every process
+    checks it at most every ``SYNC_INTERVAL`` seconds and empties its L1 when it
+    changed, so deleted keys stop being served everywhere.
+
+    Values overwritten by another process can be served from L1 for up to
+    ``L1_TIMEOUT`` seconds. Use it for content addressed keys, such as
+    rendered pages per revision, and use ``shared`` for keys that are updated
+    in place.
+
+    Options:
+
+    - ``L1_MAX_ENTRIES`` and ``L1_MAX_BYTES``: size of L1, least recently used
+      entries are evicted first
+    - ``L1_TIMEOUT``: longest time an entry stays in L1, ``None`` for no limit
+    - ``SYNC_INTERVAL``: seconds between generation checks and between flushes
+      of the hit, miss and eviction counters to L2, see ``shared_stats()``
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.location = location
+        self.max_l1_entries = options.get("L1_MAX_ENTRIES", 1000)
+        self.max_l1_bytes = options.get("L1_MAX_BYTES", 64 * 1024 * 1024)
+        self.l1_timeout = options.get("L1_TIMEOUT", 300)
+        self.sync_interval = options.get("SYNC_INTERVAL", 1)
+        self.store = _stores.setdefault(location, Store())
+
+    @property
+    def shared(self):
+        """The L2 cache, for keys updated in place by several processes."""
+        return caches[self.location]
+
+    def get(self, key, default=None, version=None):
+        if self.refresh_due():
+            self.refresh()
+        value = self.get_l1(key, version)
+        if value is not MISSING:
+            return value
+        return self.got_l2(key, version, self.shared.get(key, MISSING, version), default)
+
+    async def aget(self, key, default=None, version=None):
+        # L1 hits do not block, only go through a thread for L2
+        if self.refresh_due():
+            await self.arefresh()
+        value = self.get_l1(key, version)
+        if value is not MISSING:
+            return value
+        value = await self.shared.aget(key, MISSING, version)
+        return self.got_l2(key, version, value, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self.set_l1(key, value, timeout, version)
+        self.count("sets")
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self.set_l1(key, value, timeout, version)
+            self.count("sets")
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.delete_l1([key], version)
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        deleted = self.shared.delete(key, version)
+        self.deleted([key], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version)
+        self.deleted(keys, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def clear(self):
+        self.shared.clear()
+        with self.store.lock:
+            self.store.entries.clear()
+            self.store.size = 0
+            self.store.generation = None
+            self.store.stats.clear()
+            self.store.unsynced.clear()
+
+    # In-process L1
+
+    def get_l1(self, key, version):
+        key = self.make_and_validate_key(key, version=version)
+        with self.store.lock:
+            entry = self.store.entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.time()):
+                self.store.entries.move_to_end(key)
+                self.store.count("l1_hits")
+                return pickle.loads(entry[1])
+        return MISSING
+
+    def got_l2(self, key, version, value, default):
+        if value is MISSING:
+            self.count("misses")
+            return default
+
+        self.count("l2_hits")
+        self.set_l1(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def set_l1(self, key, value, timeout, version):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        if self.l1_timeout is not None:
+            expires = min(expires or float("inf"), time.time() + self.l1_timeout)
+
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        if len(pickled) > self.max_l1_bytes:
+            return
+
+        with self.store.lock:
+            self._pop(key)
+            self.store.entries[key] = (expires, pickled)
+            self.store.size += len(pickled)
+            while (
+                len(self.store.entries) > self.max_l1_entries
+                or self.store.size > self.max_l1_bytes
+            ):
+                self._pop(next(iter(self.store.entries)))
+                self.store.count("l1_evictions")
+
+    def deleted(self, keys, version):
+        self.delete_l1(keys, version)
+        self.bump_generation()
+        with self.store.lock:
+            for _ in keys:
+                self.store.count("deletes")
+
+    def delete_l1(self, keys, version):
+        with self.store.lock:
+            for key in keys:
+                self._pop(self.make_and_validate_key(key, version=version))
+
+    def _pop(self, key):
+        entry = self.store.entries.pop(key, None)
+        if entry is not None:
+            self.store.size -= len(entry[1])
+
+    def count(self, name):
+        with self.store.lock:
+            self.store.count(name)
+
+    # Synchronisation through L2
+
+    def refresh_due(self):
+        return time.monotonic() - self.store.synced_at >= self.sync_interval
+
+    def refresh(self):
+        """Check the generation, and flush the counters of this process."""
+        self.synced(self.shared.get(GENERATION_KEY))
+        for name, count in self.take_unsynced():
+            if not self.shared.add(self.stats_key(name), count, None):
+                self.shared.incr(self.stats_key(name), count)
+
+    async def arefresh(self):
+        self.synced(await self.shared.aget(GENERATION_KEY))
+        for name, count in self.take_unsynced():
+            if not await self.shared.aadd(self.stats_key(name), count, None):
+                await self.shared.aincr(self.stats_key(name), count)
+
+    def synced(self, generation):
+        with self.store.lock:
+            if generation != self.store.generation:
+                self.store.entries.clear()
+                self.store.size = 0
+                self.store.generation = generation
+            self.store.synced_at = time.monotonic()
+
+    def take_unsynced(self):
+        with self.store.lock:
+            unsynced, self.store.unsynced = self.store.unsynced, Counter()
+        return [(name, count) for name, count in unsynced.items() if count]
+
+    def bump_generation(self):
+        # A random token rather than a counter, the shared cache has no atomic
+        # increment and two processes deleting at once would write the same
+        # number. Every process empties its L1 on its next refresh, this one
+        # too, as it cannot tell whether another process deleted keys as well.
+        self.shared.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+    def stats_key(self, name):
+        return f"{STATS_KEY_PREFIX}:{name}"
+
+    # Metrics
+
+    def stats(self):
+        """Counters of this process, with the current size of its L1."""
+        with self.store.lock:
+            stats = {name: self.store.stats[name] for name in STATS}
+            stats["l1_entries"] = len(self.store.entries)
+            stats["l1_bytes"] = self.store.size
+        return with_ratios(stats)
+
+    def shared_stats(self):
+        """Counters of all processes, as flushed to L2 by each of them."""
+        self.refresh()
+        stats = self.shared.get_many([self.stats_key(name) for name in STATS])
+        return with_ratios({name: stats.get(self.stats_key(name), 0) for name in STATS})
+
+
+def with_ratios(stats):
+    lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+    stats["l1_hit_ratio"] = stats["l1_hits"] / lookups if lookups else 0.0
+    stats["hit_ratio"] = (stats["l1_hits"] + stats["l2_hits"]) / lookups if lookups else 0.0
+    return stats
+
+
+class ProcessTable:
+    """
+    A value each process builds with ``load()``, such as a lookup table read
+    from the database, and builds again after ``invalidate()`` was called in
+    any process.
+
+    The version is a random string in the shared cache under ``key``. A
+    counter could come back to the version of a stale table after the cache
+    is cleared. ``get()`` checks it at most every ``interval`` seconds, so
+    other processes follow a change within that time, and this process at
+    once.
+    """
+
+    def __init__(self, key, load, alias="default", interval=1):
+        self.key = key
+        self.load = load
+        self.alias = alias
+        self.interval = interval
+        self.version = None
+        self.value = None
+        self.checked_at = None
+        self.lock = Lock()
+
+    @property
+    def cache(self):
+        # The version is updated in place, skip any in-process copy of it
+        cache = caches[self.alias]
+        return getattr(cache, "shared", cache)
+
+    def get(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.interval:
+            return self.value
+
+        version = self.cache.get(self.key)
+        if version is None:
+            # Cleared or evicted, nothing says the current value is fresh
+            self.cache.add(self.key, uuid.uuid4().hex, None)
+            version = self.cache.get(self.key)
+
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.value = self.load()
+                    self.version = version
+        self.checked_at = now
+        return self.value
+
+    def invalidate(self):
+        self.cache.set(self.key, uuid.uuid4().hex, None)
+        self.checked_at = None
@@ -0,0 +1,283 @@
+"""Per-request SQL instrumentation, middleware keeping pages the same for everyone, routing and redirects."""
+
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connections
+from django.http import HttpResponsePermanentRedirect, HttpResponseRedirect
+from django.utils.encoding import uri_to_iri
+from wagtail import views as wagtail_views
+from wagtail.contrib.redirects.middleware import RedirectMiddleware
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.models import Site
+from wagtail.url_routing import RouteResult
+
+from .redirects import get_link, get_redirect_table
+from .routing import get_routing_table
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """Database ``execute_wrapper`` that records every query with its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - started))
+
+    @contextmanager
+    def record(self):
+        """Record queries on every configured database while the block runs."""
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+    def stats(self):
+        """
+        Number of queries, total SQL time, and how many queries repeated an
+        earlier one exactly (``duplicates``) or only differed in parameters
+        (``similar``, the signature of an N+1 loop).
+        """
+        statements = Counter(sql for sql, params, duration in self.queries)
+        exact = Counter((sql, repr(params)) for sql, params, duration in self.queries)
+        return {
+            "queries": len(self.queries),
+            "sql_ms": round(sum(d for sql, params, d in self.queries) * 1000, 2),
+            "duplicates": sum(count - 1 for count in exact.values()),
+            "similar": sum(count - 1 for count in statements.values()),
+        }
+
+
+class QueryStatsMiddleware:
+    """
+    Count the queries each request runs. With ``DEBUG`` they are reported in
+    the ``X-Query-Stats`` response header, otherwise as a JSON log line on the
+    ``resolve.middleware`` logger. Requests over ``QUERY_BUDGET`` queries are
+    logged as warnings.
+
+    Place it first in ``MIDDLEWARE`` so queries from other middleware, such as
+    the site lookup for redirects, are counted as well.
+    """
+
+    header = "X-Query-Stats"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            # Blocks render while the body is sent, report once it is done
+            response.streaming_content = self.record_stream(
+                recorder, request, response, response.streaming_content
+            )
+        else:
+            self.report(recorder, request, response)
+
+        return response
+
+    def record_stream(self, recorder, request, response, content):
+        with recorder.record():
+            yield from content
+        self.report(recorder, request, response)
+
+    def report(self, recorder, request, response):
+        stats = recorder.stats()
+        budget = getattr(settings, "QUERY_BUDGET", None)
+
+        if budget is not None and stats["queries"] > budget:
+            logger.warning(
+                "%s %s ran %d queries, over the budget of %d",
+                request.method,
+                request.path,
+                stats["queries"],
+                budget,
+            )
+
+        if settings.DEBUG:
+            if not response.streaming:
+                response[self.header] = "; ".join(f"{k}={v}" for k, v in stats.items())
+        else:
+            logger.info(
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.path,
+                        "status": response.status_code,
+                        **stats,
+                    }
+                )
+            )
+
+
+class AnonymousRequestMiddleware:
+    """
+    The session, authentication and messages middleware, only for requests
+    that can need them: anything but a GET or HEAD, and requests carrying a
+    session cookie. Anonymous page views skip them, with an ``AnonymousUser``
+    and an empty session that is never saved.
+
+    Use it in place of those three middleware, see ``resolve.settings.public``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.session_middleware = SessionMiddleware(
+            AuthenticationMiddleware(MessageMiddleware(get_response))
+        )
+
+    def __call__(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return self.session_middleware(request)
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return self.session_middleware(request)
+
+        request.user = AnonymousUser()
+        request.session = self.session_middleware.SessionStore()
+        return self.get_response(request)
+
+
+class EditorCookieMiddleware:
+    """
+    Set the ``editor`` cookie while a user with admin access is logged in,
+    and remove it again after they log out. Unlike the session cookie scripts
+    can read it, scripts.js only fetches the user bar when it is set.
+
+    Requests without either cookie are left alone, so anonymous page views do
+    not touch the session and stay cacheable in shared caches.
+    """
+
+    cookie_name = "editor"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        has_session = settings.SESSION_COOKIE_NAME in request.COOKIES
+        has_cookie = self.cookie_name in request.COOKIES
+        if not has_session and not has_cookie:
+            return response
+
+        is_editor = has_session and request.user.has_perm("wagtailadmin.access_admin")
+        if is_editor and not has_cookie:
+            response.set_cookie(
+                self.cookie_name,
+                "1",
+                max_age=settings.SESSION_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                samesite="Lax",
+            )
+        elif has_cookie and not is_editor:
+            response.delete_cookie(self.cookie_name, samesite="Lax")
+
+        return response
+
+
+class CachedRedirectMiddleware(RedirectMiddleware):
+    """
+    Wagtail's ``RedirectMiddleware``, looking redirects up in the in-process
+    table of ``resolve.redirects`` instead of querying for every 404. Only
+    following a redirect to a page queries, to find its URL.
+
+    Old paths ending in ``/*`` redirect every path below them as well.
+    """
+
+    def process_response(self, request, response):
+        if response.status_code != 404:
+            return response
+
+        table = get_redirect_table()
+        if not table:
+            return response
+
+        site_id = None
+
+        def get_site_id():
+            # Only paths with a site specific redirect need the site
+            nonlocal site_id
+            if site_id is None:
+                site = Site.find_for_request(request)
+                site_id = site.pk if site else 0
+            return site_id or None
+
+        path = Redirect.normalise_path(request.get_full_path())
+        path_without_query = urlparse(path).path
+        target = None
+        # The paths get_redirect() tries, in the same order
+        candidates = [path, uri_to_iri(path), path_without_query, uri_to_iri(path_without_query)]
+        for candidate in dict.fromkeys(candidates):
+            target = table.find(candidate, get_site_id)
+            if target is not None:
+                break
+        else:
+            target = table.find_prefix(path_without_query, get_site_id)
+
+        link = get_link(target) if target is not None else None
+        if link is None:
+            return response
+
+        if target[0]:
+            return HttpResponsePermanentRedirect(link)
+        return HttpResponseRedirect(link)
+
+
+class PageRoutingMiddleware:
+    """
+    Find the site of each request, and the page Wagtail's ``serve`` view
+    routes it to, in the in-process table of ``resolve.routing`` instead of
+    querying for the site and for every level of the page tree.
+
+    Both are stored where ``Site.find_for_request()`` and
+    ``Page.route_for_request()`` cache them on the request, so the view only
+    loads the page itself. Paths the table does not know are still routed by
+    Wagtail.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._routing_table = get_routing_table()
+        request._wagtail_site = request._routing_table.site_for_request(request)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        site = request._wagtail_site
+        if view_func is not wagtail_views.serve or site is None:
+            return None
+        if getattr(settings, "WAGTAIL_I18N_ENABLED", False):
+            # Wagtail routes from the root page in the requested language
+            return None
+
+        (path,) = view_args or view_kwargs.values()
+        found = request._routing_table.find_page(site, path)
+        if found is None:
+            return None
+
+        # Only the page itself is loaded, checking it is still live
+        page_id, model = found
+        page = model.objects.filter(pk=page_id, live=True).first()
+        if page is not None:
+            request._wagtail_route_for_request = RouteResult(page)
+        return None
@@ -0,0 +1,101 @@
+"""In-memory redirect table, so looking up redirects for 404s needs no queries."""
+
+from wagtail.contrib.redirects.models import Redirect
+
+from .cache import ProcessTable
+
+VERSION_KEY = "resolve:redirects:version"
+
+# Redirects from a path ending in this match the path and every path below
+# it, "/news/*" redirects "/news" and "/news/2020/title" to the same link
+WILDCARD = "/*"
+
+
+class RedirectTable:
+    """
+    Every ``Redirect`` by site and old path, as ``(is_permanent, link,
+    page_id, page_route_path)`` tuples. Paths are looked up exactly, then by
+    their longest wildcard prefix.
+
+    The site is only needed for paths with a site specific redirect, so
+    lookups take it as a callable and most never call it.
+    """
+
+    def __init__(self, rows):
+        self.exact = {}
+        self.prefixes = {}
+        # Old paths and prefixes with a redirect for a specific site
+        self.site_specific = set()
+        for old_path, site_id, *target in rows:
+            entries = self.exact
+            if old_path.endswith(WILDCARD):
+                entries = self.prefixes
+                old_path = old_path[: -len(WILDCARD)]
+            entries[(site_id, old_path)] = tuple(target)
+            if site_id is not None:
+                self.site_specific.add(old_path)
+
+    @classmethod
+    def load(cls):
+        rows = Redirect.objects.values_list(
+            "old_path",
+            "site_id",
+            "is_permanent",
+            "redirect_link",
+            "redirect_page_id",
+            "redirect_page_route_path",
+        )
+        return cls(rows.iterator(chunk_size=10_000))
+
+    def __len__(self):
+        return len(self.exact) + len(self.prefixes)
+
+    def find(self, path, get_site_id):
+        """The redirect for ``path``, preferring ones specific to the site."""
+        return self._find(self.exact, path, get_site_id)
+
+    def find_prefix(self, path, get_site_id):
+        """The redirect of the longest wildcard prefix of ``path``."""
+        prefix = path
+        while self.prefixes:
+            target = self._find(self.prefixes, prefix, get_site_id)
+            if target is not None:
+                return target
+            # The prefix of "/*" is empty, it is tried last for every path
+            if not prefix:
+                return None
+            prefix = prefix.rpartition("/")[0]
+        return None
+
+    def _find(self, entries, path, get_site_id):
+        if path in self.site_specific:
+            target = entries.get((get_site_id(), path))
+            if target is not None:
+                return target
+        return entries.get((None, path))
+
+
+def get_redirect_table():
+    """
+    The redirect table of this process, reloaded when a redirect was saved
+    or deleted since it was built, in any process.
+    """
+    return _table.get()
+
+
+def bump_redirect_version():
+    _table.invalidate()
+
+
+def get_link(target):
+    """The URL a redirect table entry points to, or None."""
+    is_permanent, redirect_link, page_id, route_path = target
+    # Same rules as Redirect.link, which only queries for page redirects
+    return Redirect(
+        redirect_link=redirect_link,
+        redirect_page_id=page_id,
+        redirect_page_route_path=route_path,
+    ).link
+
+
+_table = ProcessTable(VERSION_KEY, RedirectTable.load)
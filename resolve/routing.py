@@ -0,0 +1,92 @@
+"""In-memory site and page routing table, so routing a request needs no queries."""
+
+import copy
+
+from django.contrib.contenttypes.models import ContentType
+from django.http.request import split_domain_port
+from wagtail.models import Page, Site
+
+from .cache import ProcessTable
+
+VERSION_KEY = "resolve:routing:version"
+
+
+class RoutingTable:
+    """
+    Every ``Site``, and the id and specific model of every live page by
+    ``url_path``.
+
+    Pages whose model overrides ``route()``, and the pages below them, are
+    left out, as are pages created since the table was loaded. Requests for
+    them are routed by Wagtail.
+    """
+
+    def __init__(self, sites, pages):
+        self.default_site = None
+        self.sites_by_hostname = {}
+        for site in sites:
+            self.sites_by_hostname.setdefault(site.hostname, []).append(site)
+            if site.is_default_site:
+                self.default_site = site
+
+        self.pages = {}
+        routed_below = set()
+        for url_path, page_id, model, live in pages:
+            parent_path = url_path[: url_path.rstrip("/").rfind("/") + 1]
+            if model is None or model.route is not Page.route or parent_path in routed_below:
+                routed_below.add(url_path)
+            elif live:
+                self.pages[url_path] = (page_id, model)
+
+    @classmethod
+    def load(cls):
+        sites = Site.objects.select_related("root_page")
+        rows = Page.objects.order_by("path").values_list(
+            "url_path", "pk", "content_type_id", "live"
+        )
+        pages = (
+            (url_path, pk, ContentType.objects.get_for_id(content_type_id).model_class(), live)
+            for url_path, pk, content_type_id, live in rows.iterator(chunk_size=10_000)
+        )
+        return cls(list(sites), pages)
+
+    def find_site(self, hostname, port):
+        """The site ``Site.find_for_request()`` finds for a host and port."""
+        matches = self.sites_by_hostname.get(hostname, ())
+        for site in matches:
+            if site.port == port:
+                return site
+        for site in matches:
+            if site.is_default_site:
+                return site
+        if len(matches) == 1:
+            return matches[0]
+        return self.default_site
+
+    def find_page(self, site, path):
+        """The id and model of the live page at ``path`` below the site root."""
+        components = [component for component in path.split("/") if component]
+        url_path = site.root_page.url_path + "".join(f"{c}/" for c in components)
+        return self.pages.get(url_path)
+
+    def site_for_request(self, request):
+        """A copy of the site, so changes to it stay out of the table."""
+        # As Site.find_for_request(), which skips the ALLOWED_HOSTS check too
+        hostname = split_domain_port(request._get_raw_host())[0]
+        site = self.find_site(hostname, request.get_port())
+        return copy.copy(site) if site is not None else None
+
+
+def get_routing_table():
+    """
+    The routing table of this process, reloaded when a page or site changed
+    since it was built, in any process.
+    """
+    return _table.get()
+
+
+def bump_routing_version():
+    _table.invalidate()
+
+
+_table = ProcessTable(VERSION_KEY, RoutingTable.load)
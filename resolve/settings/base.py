@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     "home",
     "wagtail.contrib.forms",
     "wagtail.contrib.redirects",
+    "wagtail.contrib.frontend_cache",
     "wagtail.embeds",
     "wagtail.sites",
     "wagtail.users",
@@ -48,14 +49,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "resolve.middleware.QueryStatsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "resolve.middleware.EditorCookieMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "wagtail.contrib.redirects.middleware.RedirectMiddleware",
+    "resolve.middleware.CachedRedirectMiddleware",
+    "resolve.middleware.PageRoutingMiddleware",
 ]
 
 ROOT_URLCONF = "resolve.urls"
@@ -88,9 +92,32 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        # Close connections after each request. Under ASGI every request runs
+        # its sync code in a thread of its own, a connection kept open would
+        # never be used again. Opening a connection and applying SQLITE_PRAGMAS
+        # costs about a millisecond, cached pages need no connection at all.
+        "CONN_MAX_AGE": 0,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Take the write lock when a transaction starts, instead of failing
+            # with "database is locked" when a read turns into a write
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
+# Applied to every new SQLite connection, see home.signals.configure_sqlite.
+# WAL lets readers continue while the admin writes, synchronous=NORMAL is safe
+# with WAL and only syncs at checkpoints.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+    "cache_size": -64 * 1024,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "memory",
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -141,6 +168,31 @@ STATIC_URL = "/static/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
 
+# Self-hosted fonts
+# The subset_fonts management command subsets the source fonts below to the
+# characters used on the site and writes them as WOFF2 to the "fonts/" static
+# directory. base.html falls back to Google Fonts until it has been run.
+FONTS_SOURCE_DIR = os.path.join(BASE_DIR, "fonts")
+FONTS_OUTPUT_DIR = os.path.join(PROJECT_DIR, "static", "fonts")
+FONTS = [
+    {"family": "Inter", "file": "Inter[opsz,wght].ttf", "weight": "100 900", "preload": True},
+    {"family": "Inter", "file": "Inter-Italic[opsz,wght].ttf", "weight": "100 900", "style": "italic"},
+    {"family": "Source Sans 3", "file": "SourceSans3[wght].ttf", "weight": "200 900", "preload": True},
+    {"family": "Source Sans 3", "file": "SourceSans3-Italic[wght].ttf", "weight": "200 900", "style": "italic"},
+]
+
+# Critical CSS
+# The build_critical_css management command renders a sample of live pages per
+# template and stores the styles.css rules used by the first body elements.
+# base.html inlines those and loads styles.css without blocking rendering,
+# as long as templates and static files did not change since the build.
+CRITICAL_CSS_PATH = os.path.join(BASE_DIR, "critical_css.json")
+CRITICAL_CSS_FOLD_ELEMENTS = 3
+CRITICAL_CSS_SAMPLE_PAGES = 5
+
+# Output directory of the export_static management command
+STATIC_EXPORT_ROOT = os.path.join(BASE_DIR, "export")
+
 # Default storage settings
 # See https://docs.djangoproject.com/en/5.2/ref/settings/#std-setting-STORAGES
 STORAGES = {
@@ -161,6 +213,60 @@ DATA_UPLOAD_MAX_NUMBER_FIELDS = 10_000
 
 WAGTAIL_SITE_NAME = "resolve"
 
+# Caches
+# Each worker keeps recently used entries in process (L1), in front of a file
+# based cache that all workers on the machine share (L2). See resolve.cache.
+CACHES = {
+    "default": {
+        "BACKEND": "resolve.cache.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {
+            "L1_MAX_ENTRIES": 2000,
+            "L1_MAX_BYTES": 64 * 1024 * 1024,
+            "L1_TIMEOUT": 5 * 60,
+            "SYNC_INTERVAL": 1,
+        },
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache"),
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    },
+}
+
+# Purge published and unpublished pages from the responses the ASGI
+# application serves without Django. Add the reverse proxy or CDN in front of
+# the site here as well, if there is one.
+WAGTAILFRONTENDCACHE = {
+    "local": {"BACKEND": "home.frontend_cache.PageCacheBackend"},
+}
+
+# Page cache
+# Rendered pages are cached per live revision and host for anonymous visitors,
+# and dropped again when the page is published or unpublished.
+PAGE_CACHE_ALIAS = "default"
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Stream page cache misses: send everything up to the page body right away,
+# then each top-level block as it is rendered.
+PAGE_STREAMING = False
+
+# Block fragment cache
+# Blocks using CachedBlockMixin cache their HTML by block type and content hash.
+BLOCK_CACHE_ALIAS = "default"
+BLOCK_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Block render timings
+# Time blocks using TimedBlockMixin and report the slowest block types in a
+# Server-Timing header, and optionally in an HTML comment after the document.
+BLOCK_TIMING = True
+BLOCK_TIMING_TOP = 5
+BLOCK_TIMING_COMMENT = False
+
+# Query instrumentation
+# Requests running more queries than this are logged as warnings, None to disable.
+QUERY_BUDGET = None
+
 # Search
 # https://docs.wagtail.org/en/stable/topics/search/backends.html
 WAGTAILSEARCH_BACKENDS = {
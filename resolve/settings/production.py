@@ -4,9 +4,26 @@ DEBUG = False
 
 # ManifestStaticFilesStorage is recommended in production, to prevent
 # outdated JavaScript / CSS assets being served from cache
-# (e.g. after a Wagtail upgrade).
+# (e.g. after a Wagtail upgrade). Our subclass also minifies the project's
+# CSS / JavaScript and writes .gz and .br siblings during collectstatic.
 # See https://docs.djangoproject.com/en/5.2/ref/contrib/staticfiles/#manifeststaticfilesstorage
-STORAGES["staticfiles"]["BACKEND"] = "django.contrib.staticfiles.storage.ManifestStaticFilesStorage"
+STORAGES["staticfiles"]["BACKEND"] = "resolve.storage.CompressedManifestStaticFilesStorage"
+
+# One JSON line with query statistics per request, see resolve.middleware
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "resolve.middleware": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
 
 try:
     from .local import *
@@ -0,0 +1,49 @@
+"""
+Settings for workers that only serve the public site.
+
+Editors use workers running the production settings, which have the admin.
+Public workers leave out the admin apps and URLs, and skip the session,
+authentication and messages middleware for anonymous page views. Compare
+both with the benchmark_startup management command.
+"""
+
+from .production import *
+
+ROOT_URLCONF = "resolve.urls_public"
+
+ADMIN_APPS = [
+    "django.contrib.admin",
+    "wagtail.admin",
+    "wagtail.contrib.forms",
+    "wagtail.snippets",
+    "wagtail.users",
+]
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_APPS]
+
+# Session, authentication and messages only run for requests that need them
+MIDDLEWARE = [
+    "resolve.middleware.QueryStatsMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "resolve.middleware.AnonymousRequestMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "resolve.middleware.CachedRedirectMiddleware",
+    "resolve.middleware.PageRoutingMiddleware",
+]
+
+# Templates load the user bar, which is only shown to editors
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "OPTIONS": {
+            **TEMPLATES[0]["OPTIONS"],
+            "libraries": {"wagtailuserbar": "home.templatetags.public_userbar"},
+        },
+    }
+]
+
+try:
+    from .local import *
+except ImportError:
+    pass
@@ -0,0 +1,32 @@
+// Editors get the Wagtail user bar as a separate fragment, so pages are the
+// same for everyone and can be cached, see home.views.userbar
+(function () {
+  const placeholder = document.querySelector("[data-userbar]");
+  if (!placeholder || !document.cookie.split("; ").includes("editor=1")) {
+    return;
+  }
+
+  fetch(placeholder.dataset.userbar, { credentials: "same-origin" })
+    .then((response) => (response.status === 200 ? response.text() : ""))
+    .then(async (html) => {
+      const fragment = document.createRange().createContextualFragment(html);
+      const scripts = [...fragment.querySelectorAll("script")];
+      scripts.forEach((script) => script.remove());
+      placeholder.replaceWith(fragment);
+
+      // Run the scripts in order, the user bar script needs the vendor script
+      for (const original of scripts) {
+        await new Promise((resolve) => {
+          const script = document.createElement("script");
+          if (original.src) {
+            script.src = original.src;
+            script.onload = script.onerror = resolve;
+          } else {
+            script.textContent = original.textContent;
+            resolve();
+          }
+          document.body.appendChild(script);
+        });
+      }
+    });
+})();
@@ -0,0 +1,88 @@
+"""Static files storage that minifies, fingerprints and precompresses assets."""
+
+import gzip
+
+import brotli
+import rcssmin
+import rjsmin
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.contrib.staticfiles.utils import matches_patterns
+from django.core.files.base import ContentFile
+
+MINIFIERS = {
+    ".css": rcssmin.cssmin,
+    ".js": rjsmin.jsmin,
+}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ``ManifestStaticFilesStorage`` that also minifies the project's own CSS and
+    JavaScript before hashing, and writes ``.gz`` and ``.br`` siblings of every
+    text asset so the web server never has to compress on the fly.
+    """
+
+    compress_patterns = ["*.css", "*.js", "*.svg", "*.txt", "*.html", "*.json", "*.xml", "*.map"]
+
+    # Only keep a compressed sibling if it is meaningfully smaller
+    compress_min_ratio = 0.95
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+
+        paths = self.minify(paths)
+
+        stored_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                stored_names.update(n for n in (name, hashed_name) if n)
+            yield name, hashed_name, processed
+
+        for name in sorted(stored_names):
+            if matches_patterns(name, self.compress_patterns):
+                self.compress(name)
+
+    def minify(self, paths):
+        """
+        Minify collected CSS and JavaScript from ``STATICFILES_DIRS`` in place,
+        and point ``paths`` at the minified copies so hashing uses them.
+
+        App static files (Django and Wagtail admin) are shipped minified already.
+        """
+        from django.contrib.staticfiles.finders import FileSystemFinder
+
+        project_storages = FileSystemFinder().storages.values()
+        paths = dict(paths)
+        for path, (storage, source_path) in list(paths.items()):
+            minifier = next(
+                (m for ext, m in MINIFIERS.items() if path.endswith(ext)), None
+            )
+            if minifier is None or ".min." in path:
+                continue
+            if not any(storage.location == s.location for s in project_storages):
+                continue
+
+            with storage.open(source_path) as f:
+                content = f.read().decode("utf-8")
+
+            self.replace(path, minifier(content).encode("utf-8"))
+            paths[path] = (self, path)
+
+        return paths
+
+    def compress(self, name):
+        with self.open(name) as f:
+            content = f.read()
+
+        for suffix, compressed in (
+            (".gz", gzip.compress(content, compresslevel=9, mtime=0)),
+            (".br", brotli.compress(content, quality=11)),
+        ):
+            if len(compressed) < len(content) * self.compress_min_ratio:
+                self.replace(name + suffix, compressed)
+
+    def replace(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(content))